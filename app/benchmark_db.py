@@ -0,0 +1,148 @@
+"""
+Database Connection Benchmark Script.
+
+Measures throughput and latency of a short read transaction (the kind every
+authenticated request runs) under concurrent load, for several connection
+setups:
+1. Direct connection, application-side pool, statement cache on
+2. Direct connection, application-side pool, PgBouncer mode
+3. Direct connection, NullPool
+4. Through PgBouncer, application-side pool, PgBouncer mode (with --pgbouncer-url)
+5. Through PgBouncer, NullPool, PgBouncer mode (with --pgbouncer-url)
+
+Pool size, timeout and pre-ping settings are taken from the environment,
+like in the application. Run against a populated database.
+
+Usage:
+    python benchmark_db.py [--pgbouncer-url postgresql+asyncpg://...:6432/auth_db]
+                           [--concurrency 50] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import os
+import time
+
+# Add project path for module imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from config import settings
+from database.pool import pool_options
+
+# A client gives up after this many failed transactions in a row
+MAX_CONSECUTIVE_ERRORS = 10
+
+
+async def run_scenario(url: str, pgbouncer: bool, null_pool: bool, user_ids: list[int],
+                       concurrency: int, seconds: float) -> dict:
+    """
+    Run the read transaction from concurrent clients for a fixed time.
+    
+    Args:
+        url: Database URL
+        pgbouncer: Use PgBouncer compatible connection arguments
+        null_pool: Disable application-side pooling
+        user_ids: IDs of existing users to read
+        concurrency: Number of concurrent clients
+        seconds: Duration of the run
+        
+    Returns:
+        dict: Completed transactions per second, p50/p99 latency in
+        milliseconds, number of failed transactions and the last error
+        
+    Notes:
+        - A failing client backs off exponentially (up to 1 second) and
+          stops after MAX_CONSECUTIVE_ERRORS failures in a row, so a
+          persistent error (refused connection, bad URL) ends the scenario
+          instead of spinning
+    """
+    engine = create_async_engine(url, **pool_options(pgbouncer=pgbouncer, null_pool=null_pool))
+    latencies = []
+    errors = 0
+    last_error = None
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal errors, last_error
+        failures = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(
+                        text("SELECT id, email, is_active, is_role FROM users WHERE id = :id"),
+                        {"id": random.choice(user_ids)}
+                    )
+            except Exception as e:
+                errors += 1
+                failures += 1
+                last_error = e
+                if failures >= MAX_CONSECUTIVE_ERRORS:
+                    return
+                await asyncio.sleep(min(0.01 * 2 ** failures, 1.0))
+                continue
+            failures = 0
+            latencies.append(time.perf_counter() - started)
+
+    try:
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    finally:
+        await engine.dispose()
+
+    latencies.sort()
+    if not latencies:
+        return {"tps": 0.0, "p50_ms": None, "p99_ms": None, "errors": errors, "last_error": last_error}
+    return {
+        "tps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000, 2),
+        "errors": errors,
+        "last_error": last_error,
+    }
+
+
+async def main():
+    """
+    Main function to run all benchmark scenarios and print a summary table.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark direct vs PgBouncer database connections")
+    parser.add_argument("--pgbouncer-url", help="Database URL pointing at PgBouncer (transaction mode)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each scenario")
+    args = parser.parse_args()
+
+    engine = create_async_engine(settings.database_url)
+    async with engine.connect() as conn:
+        user_ids = list((await conn.execute(text("SELECT id FROM users"))).scalars())
+    await engine.dispose()
+    if not user_ids:
+        print("No users found, run reset_and_populate_test_data.py first")
+        return
+
+    scenarios = [
+        ("direct, pool", settings.database_url, False, False),
+        ("direct, pool, pgbouncer mode", settings.database_url, True, False),
+        ("direct, null pool", settings.database_url, False, True),
+    ]
+    if args.pgbouncer_url:
+        scenarios += [
+            ("pgbouncer, pool", args.pgbouncer_url, True, False),
+            ("pgbouncer, null pool", args.pgbouncer_url, True, True),
+        ]
+
+    print(f"concurrency={args.concurrency} seconds={args.seconds} "
+          f"pool_size={settings.pool_size} max_overflow={settings.max_overflow}")
+    print(f"{'scenario':<32}{'tps':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, url, pgbouncer, null_pool in scenarios:
+        result = await run_scenario(url, pgbouncer, null_pool, user_ids, args.concurrency, args.seconds)
+        print(f"{name:<32}{result['tps']:>10}{str(result['p50_ms']):>10}{str(result['p99_ms']):>10}{result['errors']:>8}")
+        if result["last_error"] is not None:
+            print(f"    last error: {result['last_error']!r}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
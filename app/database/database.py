@@ -4,34 +4,108 @@ Database configuration and session management.
 This module handles:
 - Async engine creation with connection pooling
 - Session factory for database operations
-- Database initialization and cleanup
+- Request-scoped unit of work (one commit per request, none for reads)
+- Optional read replicas for read-only requests (round-robin, lag-aware)
+- Database cleanup (schema initialization: database/migrations.py)
 """
 
+import asyncio
+import random
+from itertools import count
+
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import declarative_base
-from typing import AsyncGenerator
+from sqlalchemy.orm import Session, declarative_base
+from typing import AsyncGenerator, Callable
 from config import settings
+from database.pool import pool_options, instrument_engine, get_pool_stats
 
 # Base class for declarative models
 Base = declarative_base()
 
-# Create async engine with connection pool configuration
-engine = create_async_engine(
-    settings.database_url,
-    pool_size=settings.pool_size,
-    max_overflow=settings.max_overflow,
-    pool_pre_ping=settings.pool_pre_ping,
+# Connection pool configuration shared by the primary and replica engines
+_engine_options = dict(
+    **pool_options(),
     echo=settings.echo
 )
 
+# Create async engine with connection pool configuration
+engine = create_async_engine(settings.database_url, **_engine_options)
+instrument_engine(engine)
+
+
+class UnitOfWorkSession(Session):
+    """
+    Session that tracks whether its transaction has written anything.
+    
+    Notes:
+        - Any flush or non-SELECT statement (including text() statements such
+          as pg_notify) marks the transaction as writing
+        - Callbacks registered with after_commit run once the transaction commits
+    """
+
+
+@event.listens_for(UnitOfWorkSession, "do_orm_execute")
+def _track_statement(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["writes"] = True
+
+
+@event.listens_for(UnitOfWorkSession, "after_flush")
+def _track_flush(session, flush_context) -> None:
+    session.info["writes"] = True
+
+
+@event.listens_for(UnitOfWorkSession, "after_commit")
+def _run_after_commit(session) -> None:
+    session.info["writes"] = False
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+
+@event.listens_for(UnitOfWorkSession, "after_rollback")
+def _discard_after_commit(session) -> None:
+    session.info["writes"] = False
+    session.info.pop("after_commit", None)
+
+
 # Session factory for creating database sessions
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=UnitOfWorkSession,
     expire_on_commit=False
 )
 
 
+def has_pending_writes(session: AsyncSession) -> bool:
+    """
+    Check whether a session has changes that need a commit.
+    
+    Args:
+        session: Database session
+        
+    Returns:
+        bool: True if the open transaction wrote something or objects
+        are pending flush
+    """
+    return bool(session.info.get("writes") or session.new or session.dirty or session.deleted)
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Run a callback after the session's current transaction commits.
+    
+    Args:
+        session: Database session
+        callback: Function without arguments (e.g. an in-memory cache update)
+        
+    Notes:
+        - Discarded if the transaction is rolled back
+    """
+    session.info.setdefault("after_commit", []).append(callback)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency for getting a database session.
@@ -40,14 +114,17 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         AsyncSession: Database session for request handling
         
     Notes:
-        - Automatically commits on success
+        - Commits once on success, and only if the request wrote something;
+          handlers do not commit themselves
+        - Read-only requests never issue COMMIT
         - Rolls back on exception
         - Always closes session in finally block
     """
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()  # Auto-commit on success
+            if has_pending_writes(session):
+                await session.commit()  # Single commit per request
         except Exception:
             await session.rollback()  # Rollback on error
             raise
@@ -55,14 +132,181 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()  # Close session
 
 
-async def init_db():
+# Read replica engines (each with its own pool) and session factories
+replica_engines = [create_async_engine(url, **_engine_options) for url in settings.replica_urls]
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine)
+_replica_sessions = [
+    async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    for replica_engine in replica_engines
+]
+
+# Replication lag per replica in seconds (None = unreachable or not checked yet)
+_replica_lag: list[float | None] = [None] * len(replica_engines)
+_replica_counter = count()
+_replica_stats = {
+    "replica_reads": 0,
+    "primary_fallbacks": 0,
+}
+
+# Background lag monitor task
+_replica_monitor_task: asyncio.Task | None = None
+
+
+def _pick_replica() -> int | None:
+    """
+    Pick the next replica within the allowed lag (round-robin).
+    
+    Returns:
+        int | None: Replica index, or None if no replica is usable
     """
-    Initialize database by creating all tables.
+    replica_count = len(_replica_sessions)
+    start = next(_replica_counter)
+    for offset in range(replica_count):
+        index = (start + offset) % replica_count
+        lag = _replica_lag[index]
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS:
+            return index
+    return None
+
+
+def get_read_sessionmaker() -> async_sessionmaker:
+    """
+    Get the session factory for the next read-only session.
+    
+    Returns:
+        async_sessionmaker: Factory of a read replica, or of the primary if
+        no replica is configured or all are lagging/unreachable
+    """
+    index = _pick_replica() if _replica_sessions else None
+    if index is None:
+        if _replica_sessions:
+            _replica_stats["primary_fallbacks"] += 1
+        return AsyncSessionLocal
+    _replica_stats["replica_reads"] += 1
+    return _replica_sessions[index]
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for getting a database session for read-only handlers.
+    
+    Yields:
+        AsyncSession: Session on a read replica, or on the primary if no
+        replica is configured or all are lagging/unreachable
+        
+    Notes:
+        - Never commits; handlers using it must not write
+        - Data may lag behind the primary by up to REPLICA_MAX_LAG_SECONDS,
+          so it is not suited to reading back a write of the same client
+    """
+    async with get_read_sessionmaker()() as session:
+        yield session
+
+
+async def _check_replica_lag(index: int) -> float | None:
+    """
+    Measure the replication lag of a replica.
+    
+    Args:
+        index: Replica index
+        
+    Returns:
+        float | None: Lag in seconds, or None if the replica is unreachable,
+        not in recovery (e.g. promoted) or disconnected before replaying
+        any transaction
+        
+    Notes:
+        - A replica that is streaming from the primary and has replayed
+          everything it received counts as current even if the primary has
+          been idle for a while
+        - A replica whose WAL receiver is not streaming (disconnected) may
+          miss any number of commits, so its lag is the time since its last
+          replayed transaction, growing until it exceeds REPLICA_MAX_LAG_SECONDS
+        - Reading the WAL receiver status requires superuser or the
+          pg_read_all_stats role; without it replicas are always treated
+          as not streaming
+    """
+    try:
+        async with replica_engines[index].connect() as conn:
+            return await conn.scalar(text(
+                "SELECT CASE "
+                "WHEN NOT pg_is_in_recovery() THEN NULL "
+                "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') "
+                "THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+                "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                "END::float"
+            ))
+    except Exception as e:
+        print(f"Replica {index} lag check failed: {e!r}")
+        return None
+
+
+async def _monitor_replicas() -> None:
+    """
+    Periodically update the lag of all replicas until cancelled.
+    """
+    while True:
+        lags = await asyncio.gather(*(_check_replica_lag(index) for index in range(len(replica_engines))))
+        _replica_lag[:] = lags
+        await asyncio.sleep(settings.REPLICA_LAG_CHECK_SECONDS * random.uniform(0.8, 1.2))
+
+
+def start_replica_monitor() -> None:
+    """
+    Start the replica lag monitor (if replicas are configured).
     
     Called during application startup via lifespan context manager.
     """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    global _replica_monitor_task
+    if replica_engines and _replica_monitor_task is None:
+        _replica_monitor_task = asyncio.create_task(_monitor_replicas())
+
+
+async def stop_replica_monitor() -> None:
+    """
+    Stop the replica lag monitor.
+    
+    Called during application shutdown via lifespan context manager.
+    """
+    global _replica_monitor_task
+    if _replica_monitor_task is not None:
+        _replica_monitor_task.cancel()
+        try:
+            await _replica_monitor_task
+        except asyncio.CancelledError:
+            pass
+        _replica_monitor_task = None
+
+
+def get_replica_stats() -> dict:
+    """
+    Get read replica metrics.
+    
+    Returns:
+        dict: Current lag per replica (None = unusable), reads served by
+        replicas and reads that fell back to the primary
+    """
+    return {
+        "replicas": len(replica_engines),
+        "lag_seconds": list(_replica_lag),
+        "replica_reads": _replica_stats["replica_reads"],
+        "primary_fallbacks": _replica_stats["primary_fallbacks"],
+    }
+
+
+def get_db_pool_stats() -> dict:
+    """
+    Get connection pool metrics of the primary and replica engines.
+    
+    Returns:
+        dict: Pool metrics of the primary and of each replica
+    """
+    return {
+        "primary": get_pool_stats(engine),
+        "replicas": [get_pool_stats(replica_engine) for replica_engine in replica_engines],
+    }
 
 
 async def dispose_db():
@@ -72,3 +316,5 @@ async def dispose_db():
     Called during application shutdown via lifespan context manager.
     """
     await engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
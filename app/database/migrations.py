@@ -0,0 +1,452 @@
+"""
+Versioned Database Migrations.
+
+The schema is changed only by numbered migrations, recorded in the
+schema_migrations table:
+- `python -m database.migrations` applies pending migrations; run it once
+  per deployment, before new workers start
+- Each migration runs in its own transaction together with its version row,
+  under an advisory lock, so concurrent runs apply it exactly once
+- At startup, init_db only reads the schema version when the schema is up
+  to date (no reflection, no DDL, no locks). DB_STARTUP_MODE decides what
+  happens otherwise: "migrate" applies the pending migrations, "verify"
+  refuses to start
+  
+Migrations spell out their DDL instead of using the models, so a
+migration creates the same schema whenever it runs. Migration 1 creates the
+tables of the first versioned release and adopts tables created by earlier
+releases, so it and later migrations tolerate objects that already exist
+(IF NOT EXISTS). Released migrations must not be changed; append new ones
+to MIGRATIONS.
+
+The refresh_tokens storage layout follows REFRESH_TOKENS_PARTITIONED rather
+than a version: every migration run converts the table if the setting
+changed and creates the upcoming partitions (see database/partitions.py).
+"""
+
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from config import settings
+from database.database import engine
+from database.models_db import RefreshToken, USER_COUNTS_FUNCTION, USER_COUNTS_TRIGGERS
+from database.partitions import is_refresh_tokens_partitioned, create_refresh_token_partitions, has_refresh_token_partitions
+
+# Advisory lock key serializing migrations across processes
+_MIGRATION_LOCK_ID = 0x41504944  # "APID"
+
+# Tables and indexes of schema version 1 (frozen, do not change)
+_SCHEMA_V1 = [
+    "CREATE TABLE IF NOT EXISTS users ("
+    "id SERIAL NOT NULL, "
+    "first_name VARCHAR(30), "
+    "last_name VARCHAR(30), "
+    "patronymic VARCHAR(30), "
+    "email VARCHAR(100) NOT NULL, "
+    "hashed_password VARCHAR(255) NOT NULL, "
+    "is_active BOOLEAN, "
+    "is_role VARCHAR(50), "
+    "PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+    "CREATE TABLE IF NOT EXISTS permissions ("
+    "id SERIAL NOT NULL, "
+    "role_name VARCHAR(50) NOT NULL, "
+    "create_users BOOLEAN, "
+    "read_users BOOLEAN, "
+    "read_all_users BOOLEAN, "
+    "update_users BOOLEAN, "
+    "delete_users BOOLEAN, "
+    "create_permissions BOOLEAN, "
+    "read_permissions BOOLEAN, "
+    "read_all_permissions BOOLEAN, "
+    "update_permissions BOOLEAN, "
+    "delete_permissions BOOLEAN, "
+    "create_business_elements BOOLEAN, "
+    "read_business_elements BOOLEAN, "
+    "read_all_business_elements BOOLEAN, "
+    "update_business_elements BOOLEAN, "
+    "delete_business_elements BOOLEAN, "
+    "PRIMARY KEY (id), "
+    "UNIQUE (role_name))",
+    "CREATE INDEX IF NOT EXISTS ix_permissions_id ON permissions (id)",
+    "CREATE TABLE IF NOT EXISTS permissions_version ("
+    "id SERIAL NOT NULL, "
+    "version BIGINT NOT NULL, "
+    "PRIMARY KEY (id))",
+    "CREATE TABLE IF NOT EXISTS business_elements ("
+    "id SERIAL NOT NULL, "
+    "name VARCHAR(100) NOT NULL, "
+    "roles JSON NOT NULL, "
+    "description VARCHAR(255), "
+    "PRIMARY KEY (id), "
+    "UNIQUE (name))",
+    "CREATE INDEX IF NOT EXISTS ix_business_elements_id ON business_elements (id)",
+    "CREATE TABLE IF NOT EXISTS signing_keys ("
+    "kid VARCHAR(32) NOT NULL, "
+    "algorithm VARCHAR(10) NOT NULL, "
+    "private_key TEXT NOT NULL, "
+    "created_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+    "activates_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+    "expires_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+    "PRIMARY KEY (kid))",
+    "CREATE TABLE IF NOT EXISTS revoked_access ("
+    "key VARCHAR(64) NOT NULL, "
+    "revoked_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+    "expires_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+    "PRIMARY KEY (key))",
+    "CREATE INDEX IF NOT EXISTS ix_revoked_access_expires_at ON revoked_access (expires_at)",
+    "CREATE TABLE IF NOT EXISTS refresh_tokens ("
+    "id SERIAL NOT NULL, "
+    "user_id INTEGER NOT NULL, "
+    "family_id UUID NOT NULL, "
+    "token_hash BYTEA NOT NULL, "
+    "expires_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+    "PRIMARY KEY (id))",
+    "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_user_id_family_id ON refresh_tokens (user_id, family_id)",
+]
+
+# Indexes of the plain (not partitioned) refresh_tokens table in schema version 1
+_SCHEMA_V1_PLAIN_REFRESH_TOKENS = [
+    "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_id ON refresh_tokens (id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_refresh_tokens_token_hash ON refresh_tokens (token_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_expires_at ON refresh_tokens (expires_at)",
+]
+
+
+async def _upgrade_refresh_token_digests(conn: AsyncConnection) -> None:
+    """
+    Replace the refresh_tokens.token column with SHA-256 digests.
+    
+    Args:
+        conn: Connection with an open transaction
+        
+    Notes:
+        - Does nothing if the table has no 'token' column (new or upgraded schema)
+        - Existing tokens stay valid: their digests are computed in the database
+    """
+    has_token_column = await conn.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'refresh_tokens' AND column_name = 'token')"
+    ))
+    if not has_token_column:
+        return
+
+    await conn.execute(text("ALTER TABLE refresh_tokens ADD COLUMN IF NOT EXISTS token_hash BYTEA"))
+    await conn.execute(text(
+        "UPDATE refresh_tokens SET token_hash = sha256(convert_to(token, 'UTF8')) WHERE token_hash IS NULL"
+    ))
+    await conn.execute(text("ALTER TABLE refresh_tokens ALTER COLUMN token_hash SET NOT NULL"))
+    await conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_refresh_tokens_token_hash ON refresh_tokens (token_hash)"
+    ))
+    await conn.execute(text("ALTER TABLE refresh_tokens DROP COLUMN token"))
+    print("Migrated refresh_tokens.token to token_hash")
+
+
+async def _upgrade_refresh_token_families(conn: AsyncConnection) -> None:
+    """
+    Add the refresh_tokens.family_id column.
+    
+    Args:
+        conn: Connection with an open transaction
+        
+    Notes:
+        - Does nothing if the table does not exist or already has the column
+        - Every existing token becomes its own family
+    """
+    missing_family_column = await conn.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM information_schema.tables "
+        "WHERE table_schema = current_schema() AND table_name = 'refresh_tokens') "
+        "AND NOT EXISTS (SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'refresh_tokens' AND column_name = 'family_id')"
+    ))
+    if not missing_family_column:
+        return
+
+    await conn.execute(text("ALTER TABLE refresh_tokens ADD COLUMN family_id UUID NOT NULL DEFAULT gen_random_uuid()"))
+    await conn.execute(text("ALTER TABLE refresh_tokens ALTER COLUMN family_id DROP DEFAULT"))
+    print("Added refresh_tokens.family_id")
+
+
+async def _stash_unpartitioned_refresh_tokens(conn: AsyncConnection) -> bool:
+    """
+    Move live tokens out of a plain refresh_tokens table before partitioning it.
+    
+    Args:
+        conn: Connection with an open transaction
+        
+    Returns:
+        bool: True if tokens were stashed in the refresh_tokens_migration temporary table
+        
+    Raises:
+        RuntimeError: If the table is partitioned but REFRESH_TOKENS_PARTITIONED is off
+        
+    Notes:
+        - The plain table is dropped; the caller recreates it partitioned
+        - Expiry times are truncated to whole seconds, as stored for new tokens
+    """
+    partitioned = await is_refresh_tokens_partitioned(conn)
+    if partitioned is None or partitioned == settings.REFRESH_TOKENS_PARTITIONED:
+        return False
+    if partitioned:
+        raise RuntimeError("refresh_tokens is partitioned; set REFRESH_TOKENS_PARTITIONED=true")
+
+    await conn.execute(text(
+        "CREATE TEMPORARY TABLE refresh_tokens_migration ON COMMIT DROP AS "
+        "SELECT user_id, family_id, token_hash, date_trunc('second', expires_at) AS expires_at "
+        "FROM refresh_tokens WHERE expires_at > now()"
+    ))
+    await conn.execute(text("DROP TABLE refresh_tokens"))
+    return True
+
+
+async def _create_schema(conn: AsyncConnection) -> None:
+    """
+    Migration 1: create all tables, upgrading tables created by earlier releases.
+    
+    Args:
+        conn: Connection with an open transaction
+        
+    Notes:
+        - refresh_tokens is created plain; _sync_refresh_token_storage
+          partitions it afterwards if REFRESH_TOKENS_PARTITIONED is on
+        - A refresh_tokens table partitioned by an earlier release is kept
+          as it is (its indexes include the partition key)
+    """
+    await _upgrade_refresh_token_digests(conn)
+    await _upgrade_refresh_token_families(conn)
+    for statement in _SCHEMA_V1:
+        await conn.execute(text(statement))
+    if not await is_refresh_tokens_partitioned(conn):
+        for statement in _SCHEMA_V1_PLAIN_REFRESH_TOKENS:
+            await conn.execute(text(statement))
+
+
+async def _add_user_listing_indexes(conn: AsyncConnection) -> None:
+    """
+    Migration 2: add indexes for the paginated, filterable admin user listing.
+    
+    Args:
+        conn: Connection with an open transaction
+    """
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_is_role_id ON users (is_role, id)"))
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_is_active_id ON users (is_active, id)"))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_email_pattern ON users (email varchar_pattern_ops)"
+    ))
+
+
+async def _add_user_counts(conn: AsyncConnection) -> None:
+    """
+    Migration 3: add the user_counts table, its triggers and initial counts.
+    
+    Args:
+        conn: Connection with an open transaction
+        
+    Notes:
+        - users is locked against writes while the counts are computed, so
+          no change is counted twice or missed
+    """
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS user_counts ("
+        "id BIGSERIAL NOT NULL, "
+        "is_role VARCHAR(50) NOT NULL, "
+        "is_active BOOLEAN NOT NULL, "
+        "count BIGINT NOT NULL, "
+        "PRIMARY KEY (id))"
+    ))
+    await conn.execute(USER_COUNTS_FUNCTION)
+    await conn.execute(text("LOCK TABLE users IN SHARE MODE"))
+    for operation in ("insert", "update", "delete"):
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS users_count_{operation} ON users"))
+    for trigger in USER_COUNTS_TRIGGERS:
+        await conn.execute(trigger)
+    await conn.execute(text("DELETE FROM user_counts"))
+    await conn.execute(text(
+        "INSERT INTO user_counts (is_role, is_active, count) "
+        "SELECT coalesce(is_role, ''), coalesce(is_active, false), count(*) FROM users GROUP BY 1, 2"
+    ))
+
+
+# Ordered (version, description, upgrade function) entries
+MIGRATIONS = [
+    (1, "Create schema", _create_schema),
+    (2, "Add user listing indexes", _add_user_listing_indexes),
+    (3, "Add user counts", _add_user_counts),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def _sync_refresh_token_storage(conn: AsyncConnection) -> None:
+    """
+    Convert refresh_tokens to the layout selected by REFRESH_TOKENS_PARTITIONED.
+    
+    Args:
+        conn: Connection with an open transaction
+        
+    Notes:
+        - Switching partitioning on keeps unexpired tokens
+        - Also creates the upcoming daily partitions
+    """
+    migrate_to_partitions = await _stash_unpartitioned_refresh_tokens(conn)
+    if migrate_to_partitions:
+        await conn.run_sync(RefreshToken.__table__.create)
+
+    if settings.REFRESH_TOKENS_PARTITIONED:
+        await create_refresh_token_partitions(conn)
+        if migrate_to_partitions:
+            result = await conn.execute(text(
+                "INSERT INTO refresh_tokens (user_id, family_id, token_hash, expires_at) "
+                "SELECT user_id, family_id, token_hash, expires_at FROM refresh_tokens_migration"
+            ))
+            print(f"Migrated {result.rowcount} refresh tokens to the partitioned table")
+
+
+async def _lock(conn: AsyncConnection) -> None:
+    """
+    Take the migration advisory lock and make sure the version table exists.
+    
+    Args:
+        conn: Connection with an open transaction
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": _MIGRATION_LOCK_ID})
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+    ))
+
+
+async def get_schema_version(conn: AsyncConnection) -> int | None:
+    """
+    Get the version of the database schema.
+    
+    Args:
+        conn: Database connection
+        
+    Returns:
+        int | None: Latest applied migration, 0 if none,
+        None if the database has never been migrated
+    """
+    if not await conn.scalar(text("SELECT to_regclass('schema_migrations') IS NOT NULL")):
+        return None
+    return await conn.scalar(text("SELECT coalesce(max(version), 0) FROM schema_migrations"))
+
+
+async def stamp_schema_version(conn: AsyncConnection) -> None:
+    """
+    Mark all migrations as applied (for a schema created from the models).
+    
+    Args:
+        conn: Connection with an open transaction
+    """
+    await _lock(conn)
+    await conn.execute(text("DELETE FROM schema_migrations"))
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+        [{"version": version, "description": description} for version, description, _ in MIGRATIONS]
+    )
+
+
+async def migrate() -> int:
+    """
+    Apply pending migrations.
+    
+    Returns:
+        int: Number of migrations applied
+    """
+    applied = 0
+    for version, description, upgrade in MIGRATIONS:
+        async with engine.begin() as conn:
+            await _lock(conn)
+            if version <= await get_schema_version(conn):
+                continue
+            await upgrade(conn)
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description}
+            )
+        applied += 1
+        print(f"Applied migration {version}: {description}")
+
+    async with engine.begin() as conn:
+        await _lock(conn)
+        await _sync_refresh_token_storage(conn)
+    return applied
+
+
+async def is_schema_current() -> bool:
+    """
+    Check that all migrations are applied and refresh_tokens has the configured layout.
+    
+    Returns:
+        bool: True if the schema needs no migration
+        
+    Notes:
+        - A newer schema than this release knows counts as current, so
+          workers of the previous release keep starting during a rollout
+        - A partitioned refresh_tokens table without partitions for tokens
+          issued now is outdated, so a start (or migration run) extends the
+          partitions even if the sweeper has not
+    """
+    async with engine.connect() as conn:
+        version = await get_schema_version(conn)
+        if version is None or version < LATEST_VERSION:
+            return False
+        if await is_refresh_tokens_partitioned(conn) != settings.REFRESH_TOKENS_PARTITIONED:
+            return False
+        return not settings.REFRESH_TOKENS_PARTITIONED or await has_refresh_token_partitions(conn)
+
+
+async def init_db():
+    """
+    Make sure the database schema is ready before serving requests.
+    
+    Called during application startup via lifespan context manager.
+    
+    Raises:
+        RuntimeError: If the schema is outdated and DB_STARTUP_MODE is "verify"
+        
+    Notes:
+        - An up-to-date schema costs a few small queries, so many workers
+          can start at once
+    """
+    if await is_schema_current():
+        return
+    if settings.DB_STARTUP_MODE == "verify":
+        raise RuntimeError("Database schema is outdated; run `python -m database.migrations`")
+    await migrate()
+
+
+async def main():
+    """
+    Apply pending migrations, or only check the schema with --check.
+    """
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if migrations are pending")
+    args = parser.parse_args()
+
+    try:
+        if args.check:
+            current = await is_schema_current()
+            print("Schema is up to date" if current else "Migrations are pending")
+            return 0 if current else 1
+
+        applied = await migrate()
+        async with engine.connect() as conn:
+            version = await get_schema_version(conn)
+        print(f"Applied {applied} migration(s), schema version {version}")
+        return 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
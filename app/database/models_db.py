@@ -3,14 +3,20 @@ Database models for the Authentication API.
 
 This module defines SQLAlchemy ORM models for:
 - User authentication and profiles
-- Role-based permissions
+- Per-role user counters (maintained by triggers on users)
+- Role-based permissions and their version counter
 - Business elements with role access
 - Refresh token storage
+- JWT signing keys
+- Access token revocations
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import (
+    Column, DDL, Index, Integer, BigInteger, String, Text, Boolean, DateTime, LargeBinary, Uuid, event
+)
 from sqlalchemy.dialects.postgresql import JSON
 from database.database import Base
+from config import settings
 import datetime
 
 
@@ -27,10 +33,21 @@ class User(Base):
         hashed_password: Bcrypt-hashed password
         is_active: Account status (active/inactive)
         is_role: User's role name (e.g., 'admin', 'user', 'moderator')
+        
+    Notes:
+        - Composite (filter, id) indexes serve filtered keyset pagination
+          of the admin user listing; the varchar_pattern_ops index serves
+          email prefix (LIKE 'prefix%') searches under any collation
     """
 
     __tablename__ = "users"
 
+    __table_args__ = (
+        Index("ix_users_is_role_id", "is_role", "id"),
+        Index("ix_users_is_active_id", "is_active", "id"),
+        Index("ix_users_email_pattern", "email", postgresql_ops={"email": "varchar_pattern_ops"}),
+    )
+
     # Primary fields
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(30))
@@ -44,6 +61,84 @@ class User(Base):
     is_role = Column(String(50), default="user")
 
 
+class UserCount(Base):
+    """
+    Change of the number of users per role and status, written by triggers on users.
+    
+    Attributes:
+        id: Primary key
+        is_role: Role name ('' for users without a role)
+        is_active: Account status (NULL counts as inactive)
+        count: Number of users added (negative: removed) by one statement
+        
+    Notes:
+        - The sum of count per (is_role, is_active) is the exact number of
+          users; rows are only ever inserted, so concurrent writes to users
+          never wait on (or deadlock over) a shared counter row
+        - tools/user_counts.py compacts the rows to one per key in the background
+    """
+
+    __tablename__ = "user_counts"
+
+    id = Column(BigInteger, primary_key=True)
+    is_role = Column(String(50), nullable=False)
+    is_active = Column(Boolean, nullable=False)
+    count = Column(BigInteger, nullable=False)
+
+
+# Trigger function recording the changes of one statement on users in user_counts
+USER_COUNTS_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION user_counts_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO user_counts (is_role, is_active, count)
+        SELECT coalesce(is_role, ''), coalesce(is_active, false), count(*)
+        FROM new_rows GROUP BY 1, 2;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO user_counts (is_role, is_active, count)
+        SELECT coalesce(is_role, ''), coalesce(is_active, false), -count(*)
+        FROM old_rows GROUP BY 1, 2;
+    ELSE
+        INSERT INTO user_counts (is_role, is_active, count)
+        SELECT is_role, is_active, sum(change) FROM (
+            SELECT coalesce(o.is_role, '') AS is_role, coalesce(o.is_active, false) AS is_active, -1 AS change
+            FROM old_rows o JOIN new_rows n USING (id)
+            WHERE (o.is_role, o.is_active) IS DISTINCT FROM (n.is_role, n.is_active)
+            UNION ALL
+            SELECT coalesce(n.is_role, ''), coalesce(n.is_active, false), 1
+            FROM old_rows o JOIN new_rows n USING (id)
+            WHERE (o.is_role, o.is_active) IS DISTINCT FROM (n.is_role, n.is_active)
+        ) changes
+        GROUP BY 1, 2 HAVING sum(change) <> 0;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""")
+
+# Statement-level triggers (transition tables allow only one event per trigger)
+USER_COUNTS_TRIGGERS = [
+    DDL(
+        "CREATE TRIGGER users_count_insert AFTER INSERT ON users REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_update()"
+    ),
+    DDL(
+        "CREATE TRIGGER users_count_update AFTER UPDATE ON users "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_update()"
+    ),
+    DDL(
+        "CREATE TRIGGER users_count_delete AFTER DELETE ON users REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_update()"
+    ),
+]
+
+# Tables created from the models get the triggers as well (e.g. by the reset script)
+event.listen(User.__table__, "after_create", USER_COUNTS_FUNCTION)
+for trigger in USER_COUNTS_TRIGGERS:
+    event.listen(User.__table__, "after_create", trigger)
+
+
 class Permissions(Base):
     """
     Permissions model for role-based access control (RBAC).
@@ -90,6 +185,24 @@ class Permissions(Base):
     delete_business_elements = Column(Boolean, default=False)
 
 
+class PermissionsVersion(Base):
+    """
+    Global permissions version counter (single row with id = 1).
+    
+    Incremented whenever role permissions or a user's role change, so
+    access tokens carrying permission claims can be checked for staleness.
+    
+    Attributes:
+        id: Primary key (always 1)
+        version: Current permissions version
+    """
+
+    __tablename__ = "permissions_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
 class BusinessElements(Base):
     """
     Business elements model for storing application-specific data.
@@ -123,13 +236,85 @@ class RefreshToken(Base):
     Attributes:
         id: Primary key
         user_id: ID of the user who owns this token
-        token: JWT refresh token string (unique)
+        family_id: Login session the token belongs to; kept across rotations
+        token_hash: SHA-256 digest of the JWT refresh token (unique)
         expires_at: Token expiration timestamp (UTC)
+        
+    Notes:
+        - Only the digest is stored, which keeps the unique index small and
+          means a leaked table does not contain usable tokens
+        - With REFRESH_TOKENS_PARTITIONED the table is range-partitioned by
+          expires_at (see database/partitions.py); the partition key is then
+          part of the primary key and of the token_hash index
     """
 
     __tablename__ = "refresh_tokens"
 
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_id_family_id", "user_id", "family_id"),
+    )
+    if settings.REFRESH_TOKENS_PARTITIONED:
+        __table_args__ += (
+            Index("ix_refresh_tokens_token_hash", "token_hash", "expires_at", unique=True),
+            {"postgresql_partition_by": "RANGE (expires_at)"},
+        )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, nullable=False)
-    token = Column(String(255), unique=True, index=True, nullable=False)
+    family_id = Column(Uuid, nullable=False)
+    token_hash = Column(
+        LargeBinary(32),
+        unique=not settings.REFRESH_TOKENS_PARTITIONED,
+        index=not settings.REFRESH_TOKENS_PARTITIONED,
+        nullable=False
+    )
+    expires_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        primary_key=settings.REFRESH_TOKENS_PARTITIONED,
+        index=not settings.REFRESH_TOKENS_PARTITIONED
+    )
+
+
+class SigningKey(Base):
+    """
+    Asymmetric JWT signing key (used with ES256/EdDSA algorithms).
+    
+    Shared by all workers; public parts are published via JWKS.
+    
+    Attributes:
+        kid: Key ID (sent in the JWT 'kid' header)
+        algorithm: JWT algorithm the key is used with
+        private_key: PEM-encoded private key, encrypted with SECRET_KEY
+        created_at: Key creation timestamp (UTC)
+        activates_at: Time from which the key is used for signing (UTC)
+        expires_at: Time after which the key is no longer accepted (UTC)
+    """
+
+    __tablename__ = "signing_keys"
+
+    kid = Column(String(32), primary_key=True)
+    algorithm = Column(String(10), nullable=False)
+    private_key = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    activates_at = Column(DateTime(timezone=True), nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class RevokedAccess(Base):
+    """
+    Access token revocation entry.
+    
+    Attributes:
+        key: "jti:<token id>" for a single access token, or "user:<user_id>"
+             for all access tokens of a user issued up to revoked_at
+        revoked_at: Revocation timestamp (UTC)
+        expires_at: Time after which no token covered by the entry is valid
+                    anyway, so the entry can be deleted (UTC)
+    """
+
+    __tablename__ = "revoked_access"
+
+    key = Column(String(64), primary_key=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,174 @@
+"""
+Refresh Token Partition Management.
+
+With REFRESH_TOKENS_PARTITIONED enabled, refresh_tokens is range-partitioned
+by expires_at into daily (UTC) partitions named refresh_tokens_pYYYYMMDD:
+- Partitions are created ahead of time, far enough to hold tokens issued
+  REFRESH_TOKEN_PARTITIONS_AHEAD days from now
+- A partition whose day has passed contains only expired tokens and is
+  dropped as a whole instead of deleting its rows
+"""
+
+import re
+from datetime import date, datetime, time, timedelta
+import datetime as D
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from config import settings
+
+PARTITION_PREFIX = "refresh_tokens_p"
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{8}})$")
+
+
+def _partition_name(day: date) -> str:
+    """
+    Build the partition table name for a day.
+    
+    Args:
+        day: UTC day covered by the partition
+        
+    Returns:
+        str: Partition table name
+    """
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _day_start(day: date) -> str:
+    """
+    Format the start of a UTC day as a partition bound literal.
+    
+    Args:
+        day: UTC day
+        
+    Returns:
+        str: ISO timestamp with time zone
+    """
+    return datetime.combine(day, time.min, tzinfo=D.timezone.utc).isoformat()
+
+
+async def is_refresh_tokens_partitioned(conn: AsyncConnection) -> bool | None:
+    """
+    Check how the refresh_tokens table is stored.
+    
+    Args:
+        conn: Database connection
+        
+    Returns:
+        bool | None: True if partitioned, False if a plain table,
+        None if the table does not exist
+    """
+    relkind = await conn.scalar(text(
+        "SELECT c.relkind::text FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = current_schema() AND c.relname = 'refresh_tokens'"
+    ))
+    if relkind is None:
+        return None
+    return relkind == "p"
+
+
+async def create_refresh_token_partitions(conn: AsyncConnection) -> int:
+    """
+    Create missing daily partitions from today up to the partitioning horizon.
+    
+    Args:
+        conn: Connection with an open transaction
+        
+    Returns:
+        int: Number of partitions created
+        
+    Notes:
+        - The horizon is REFRESH_TOKEN_EXPIRE_DAYS + REFRESH_TOKEN_PARTITIONS_AHEAD
+          days, so tokens issued before the next few maintenance runs fit
+    """
+    existing = await _list_partitions(conn)
+    today = datetime.now(D.timezone.utc).date()
+    horizon = settings.REFRESH_TOKEN_EXPIRE_DAYS + settings.REFRESH_TOKEN_PARTITIONS_AHEAD
+
+    created = 0
+    for offset in range(horizon + 1):
+        day = today + timedelta(days=offset)
+        if day in existing:
+            continue
+        await conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{_partition_name(day)}" PARTITION OF refresh_tokens '
+            f"FOR VALUES FROM ('{_day_start(day)}') TO ('{_day_start(day + timedelta(days=1))}')"
+        ))
+        created += 1
+    return created
+
+
+async def has_refresh_token_partitions(conn: AsyncConnection) -> bool:
+    """
+    Check that partitions exist for every token that can be issued now.
+    
+    Args:
+        conn: Database connection
+        
+    Returns:
+        bool: True if there are partitions from today up to the expiry day
+        of a refresh token issued now
+        
+    Notes:
+        - Only the token lifetime is required, not the full horizon, so a
+          schema whose partitions were extended a day ago still counts as
+          current
+    """
+    existing = await _list_partitions(conn)
+    today = datetime.now(D.timezone.utc).date()
+    return all(
+        today + timedelta(days=offset) in existing
+        for offset in range(settings.REFRESH_TOKEN_EXPIRE_DAYS + 1)
+    )
+
+
+async def drop_expired_refresh_token_partitions(conn: AsyncConnection) -> int:
+    """
+    Drop partitions whose whole day lies in the past.
+    
+    Args:
+        conn: Connection with an open transaction
+        
+    Returns:
+        int: Number of partitions dropped
+        
+    Notes:
+        - Dropping a partition briefly locks the parent table; lock_timeout
+          makes the drop give up (and retry on the next run) instead of
+          queueing requests behind a long-running query
+    """
+    today = datetime.now(D.timezone.utc).date()
+    expired = [day for day in await _list_partitions(conn) if day < today]
+    if not expired:
+        return 0
+
+    await conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    for day in expired:
+        await conn.execute(text(f'DROP TABLE IF EXISTS "{_partition_name(day)}"'))
+    return len(expired)
+
+
+async def _list_partitions(conn: AsyncConnection) -> set[date]:
+    """
+    List the days covered by existing refresh_tokens partitions.
+    
+    Args:
+        conn: Database connection
+        
+    Returns:
+        set[date]: Days of partitions following the naming scheme
+    """
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE n.nspname = current_schema() AND p.relname = 'refresh_tokens'"
+    ))
+    days = set()
+    for (name,) in result:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            days.add(datetime.strptime(match.group(1), "%Y%m%d").date())
+    return days
@@ -0,0 +1,218 @@
+"""
+Connection Pool Instrumentation.
+
+This module provides:
+- A queue pool that measures how long each connection checkout waits
+  (including opening a new connection) and counts pool timeouts
+- Pre-ping failure counting through the engine's handle_error event
+- An optional background health check, used instead of pre-ping
+- Pool metrics (size, checked out, overflow, wait-time histogram)
+- PgBouncer (transaction pooling) compatible connection arguments
+
+PgBouncer in transaction mode hands each transaction a possibly different
+server connection, so prepared statements cached on one connection are
+missing (or clash by name) on the next. With PGBOUNCER_MODE asyncpg's
+statement caches are disabled and every prepared statement gets a unique
+name, making each statement independent of the server connection.
+"""
+
+import asyncio
+import random
+import time
+from uuid import uuid4
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from config import settings
+
+# Upper bounds (seconds) of the checkout wait-time histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Background health check tasks
+_health_check_tasks: list[asyncio.Task] = []
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool recording checkout wait times and timeouts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_total = 0.0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.pre_ping_failures = 0
+        self.health_checks = 0
+        self.health_check_failures = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_total += waited
+            for index, bound in enumerate(WAIT_BUCKETS):
+                if waited <= bound:
+                    self.wait_histogram[index] += 1
+                    break
+            else:
+                self.wait_histogram[-1] += 1
+
+
+def _prepared_statement_name() -> str:
+    """
+    Generate a prepared statement name unique across PgBouncer server connections.
+    """
+    return f"__asyncpg_{uuid4()}__"
+
+
+def pool_options(pgbouncer: bool | None = None, null_pool: bool | None = None) -> dict:
+    """
+    Build the create_async_engine pool arguments from settings.
+    
+    Args:
+        pgbouncer: Use PgBouncer compatible connection arguments (default: PGBOUNCER_MODE)
+        null_pool: Disable application-side pooling (default: DB_NULL_POOL)
+        
+    Returns:
+        dict: Keyword arguments shared by the primary and replica engines
+        
+    Notes:
+        - Without a statement cache every query is prepared anew, which costs
+          an extra round trip; keep PGBOUNCER_MODE off for direct connections
+    """
+    pgbouncer = settings.PGBOUNCER_MODE if pgbouncer is None else pgbouncer
+    null_pool = settings.DB_NULL_POOL if null_pool is None else null_pool
+
+    options = dict(pool_pre_ping=settings.pool_pre_ping)
+    if pgbouncer:
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": _prepared_statement_name,
+        }
+    if null_pool:
+        return dict(options, poolclass=NullPool)
+
+    return dict(
+        options,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_use_lifo=settings.pool_use_lifo,
+    )
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Count pre-ping failures of an engine's pool.
+    
+    Args:
+        engine: Engine created with pool_options()
+    """
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _count_pre_ping_failure(context) -> None:
+        if context.is_pre_ping and isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.pre_ping_failures += 1
+
+
+async def _health_check_loop(engine: AsyncEngine) -> None:
+    """
+    Periodically run a trivial query on a pooled connection until cancelled.
+    
+    Notes:
+        - When the query fails with a disconnect error, SQLAlchemy invalidates
+          every connection of the pool opened before it, so requests get
+          fresh connections instead of each discovering a dead one
+    """
+    while True:
+        await asyncio.sleep(settings.pool_health_check_seconds * random.uniform(0.8, 1.2))
+        pool = engine.pool
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        except Exception as e:
+            if isinstance(pool, InstrumentedQueuePool):
+                pool.health_check_failures += 1
+            print(f"Connection pool health check failed: {e!r}")
+        finally:
+            if isinstance(pool, InstrumentedQueuePool):
+                pool.health_checks += 1
+
+
+def start_pool_health_checks(*engines: AsyncEngine) -> None:
+    """
+    Start background health checks (if pool_health_check_seconds is set).
+    
+    Args:
+        engines: Engines to check
+        
+    Called during application startup via lifespan context manager.
+    """
+    if settings.pool_health_check_seconds <= 0 or _health_check_tasks:
+        return
+    for engine in engines:
+        _health_check_tasks.append(asyncio.create_task(_health_check_loop(engine)))
+
+
+async def stop_pool_health_checks() -> None:
+    """
+    Stop the background health checks.
+    
+    Called during application shutdown via lifespan context manager.
+    """
+    for task in _health_check_tasks:
+        task.cancel()
+    for task in _health_check_tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _health_check_tasks.clear()
+
+
+def get_pool_stats(engine: AsyncEngine) -> dict:
+    """
+    Get connection pool metrics of an engine.
+    
+    Args:
+        engine: Engine created with pool_options()
+        
+    Returns:
+        dict: Pool size, checked-out and overflow connections, checkouts,
+        timeouts, cumulative wait-time histogram ({"le_<seconds>": count}),
+        mean wait, pre-ping and health check failures
+    """
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return {"pool": type(pool).__name__}
+
+    histogram = {}
+    cumulative = 0
+    for bound, bucket in zip(WAIT_BUCKETS + (float("inf"),), pool.wait_histogram):
+        cumulative += bucket
+        histogram[f"le_{bound}"] = cumulative
+
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": pool.checkouts,
+        "timeouts": pool.timeouts,
+        "wait_seconds_histogram": histogram,
+        "wait_seconds_mean": round(pool.wait_total / pool.checkouts, 6) if pool.checkouts else 0.0,
+        "pre_ping_failures": pool.pre_ping_failures,
+        "health_checks": pool.health_checks,
+        "health_check_failures": pool.health_check_failures,
+    }
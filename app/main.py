@@ -15,7 +15,20 @@ from routers.admin import admin_router
 from routers.user import user_router
 from routers.permission import permission_router
 from routers.business_elements import business_elements_router
-from database.database import init_db, dispose_db
+from routers.well_known import well_known_router
+from database.database import (
+    engine, replica_engines, dispose_db, start_replica_monitor, stop_replica_monitor, get_replica_stats,
+    get_db_pool_stats
+)
+from database.migrations import init_db
+from database.pool import start_pool_health_checks, stop_pool_health_checks
+from tools.hash import get_hash_executor_stats, start_hash_executor, shutdown_hash_executor
+from tools.auth_func import get_token_cache_stats
+from tools.revocation import load_revocation_filter, start_revocation_sync, stop_revocation_sync, get_revocation_stats
+from tools.token_sweeper import start_token_sweeper, stop_token_sweeper, get_token_sweeper_stats
+from tools.user_counts import start_user_counts_compaction, stop_user_counts_compaction, get_user_counts_stats
+from tools.signing_keys import init_signing_keys, start_key_rotation, stop_key_rotation
+from tools.permission_cache import init_permission_cache, start_permission_sync, stop_permission_sync, get_permission_cache_stats
 from config import settings
 from contextlib import asynccontextmanager
 
@@ -26,19 +39,70 @@ async def lifespan(app: FastAPI):
     Application lifespan context manager.
     
     Handles:
-    - Database initialization on startup
+    - Database schema check (and migration, if enabled) on startup
+    - Read replica lag monitoring
+    - Connection pool health checks (if enabled)
+    - JWT signing key loading and rotation
+    - Permission matrix loading on startup
+    - Access token revocation filter
+    - Expired refresh token sweeper
+    - User count compaction
+    - Password hashing executor warm-up on startup
     - Resource cleanup on shutdown
     """
-    # Initialize database on startup
+    # Check the schema version and apply pending migrations (DB_STARTUP_MODE)
     await init_db()
     print(f"Database initialized: {settings.database_url}")
+    if settings.PGBOUNCER_MODE and not settings.DB_DIRECT_HOST:
+        print("Warning: PGBOUNCER_MODE without DB_DIRECT_HOST, change notifications "
+              "(LISTEN) go through PgBouncer and caches rely on periodic resync")
+
+    # Track replication lag of read replicas (if configured)
+    start_replica_monitor()
+
+    # Check pooled connections in the background (alternative to pre-ping)
+    start_pool_health_checks(engine, *replica_engines)
+
+    # Load JWT signing keys (asymmetric algorithms only)
+    await init_signing_keys()
+    start_key_rotation()
+
+    # Load permission matrix and listen for changes from other workers
+    await init_permission_cache()
+    start_permission_sync()
+    print("Permission matrix loaded")
+
+    # Load access token revocation filter and listen for new revocations
+    await load_revocation_filter()
+    start_revocation_sync()
+
+    # Delete expired refresh tokens in the background
+    start_token_sweeper()
+
+    # Merge user_counts rows in the background
+    start_user_counts_compaction()
+
+    # Pre-start password hashing workers
+    await start_hash_executor()
+    print(f"Password hashing executor started: {settings.HASH_BACKEND}")
 
     yield  # Application runs here
 
     # Cleanup resources on shutdown
+    await stop_permission_sync()
+    await stop_key_rotation()
+    await stop_token_sweeper()
+    await stop_user_counts_compaction()
+    await stop_revocation_sync()
+    await stop_replica_monitor()
+    await stop_pool_health_checks()
+
     await dispose_db()
     print("Database resources disposed")
 
+    await shutdown_hash_executor()
+    print("Password hashing executor stopped")
+
 
 # Create FastAPI application instance
 app = FastAPI(
@@ -55,7 +119,8 @@ app.add_middleware(
     allow_origins=["*"],  # TODO: Replace with specific domains in production
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["Link", "X-Next-Cursor"]  # Pagination of /admin/users
 )
 
 # Include API routers
@@ -64,6 +129,7 @@ app.include_router(admin_router)
 app.include_router(user_router)
 app.include_router(permission_router)
 app.include_router(business_elements_router)
+app.include_router(well_known_router)
 
 
 @app.get("/")
@@ -77,6 +143,26 @@ async def root():
     return {"message": "Authentication API", "status": "running"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Runtime metrics endpoint.
+    
+    Returns:
+        dict: Internal metrics used for capacity planning
+    """
+    return {
+        "password_hashing": get_hash_executor_stats(),
+        "permission_matrix": get_permission_cache_stats(),
+        "token_cache": get_token_cache_stats(),
+        "token_sweeper": get_token_sweeper_stats(),
+        "user_counts": get_user_counts_stats(),
+        "access_revocation": get_revocation_stats(),
+        "read_replicas": get_replica_stats(),
+        "db_pool": get_db_pool_stats()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -3,7 +3,7 @@ Database Reset and Test Data Population Script.
 
 This script:
 1. Drops all tables from the database
-2. Recreates all tables
+2. Recreates all tables (marked as fully migrated)
 3. Populates with test users, permissions, and business elements
 
 Test credentials (all users have password: 'password123'):
@@ -27,6 +27,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from database.database import engine, Base
+from database.partitions import create_refresh_token_partitions
+from database.migrations import stamp_schema_version
+from config import settings
 from database.models_db import User, Permissions, BusinessElements
 from tools.hash import get_password_hash
 
@@ -42,6 +45,10 @@ async def reset_database():
         await conn.run_sync(Base.metadata.drop_all)
         # Recreate all tables
         await conn.run_sync(Base.metadata.create_all)
+        if settings.REFRESH_TOKENS_PARTITIONED:
+            await create_refresh_token_partitions(conn)
+        # Tables match the latest migration
+        await stamp_schema_version(conn)
 
 
 async def create_test_users():
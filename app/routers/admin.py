@@ -2,73 +2,274 @@
 Admin Panel Router.
 
 Endpoints for user management (requires admin permissions):
-- List all users
+- List users (keyset pagination, filters)
+- Export users (streamed NDJSON or CSV)
+- User counts per role and status
 - Get user by ID
 - Update user role
 - Activate/deactivate users
 - Delete users
+- Bulk role change, activation, deactivation and deletion (by IDs or filter)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import ARRAY, Integer, any_, bindparam, delete, func, text, update
 from sqlalchemy.future import select
-from typing import List
 
-from database.models_db import User
-from database.database import get_db
-from tools.auth_func import require_permission
+from config import settings
+from database.models_db import User, UserCount
+from database.database import get_db, get_read_db, get_read_sessionmaker
+from tools.auth_func import authorize, revoke_refresh_tokens, revoke_users_refresh_tokens
+from tools.revocation import revoke_user_access, revoke_users_access
+from tools.permission_cache import publish_permission_change, publish_permission_changes
+from tools.schemas import BulkUserSelection, BulkRoleUpdate
 
 admin_router = APIRouter(prefix="/admin", tags=["Admin Panel"])
 
+# Columns returned by user listings (no password hash, no ORM entities)
+USER_LIST_COLUMNS = (
+    User.id, User.email, User.first_name, User.last_name, User.patronymic, User.is_active, User.is_role
+)
+
+# Rows fetched from the server-side cursor (and written to the response) at a time
+EXPORT_CHUNK_SIZE = 1000
+
+
+def user_filters(is_role: str | None, is_active: bool | None, email_prefix: str | None) -> list:
+    """
+    Build WHERE conditions for user listings.
+    
+    Args:
+        is_role: Only users with this role
+        is_active: Only active (True) or inactive (False) users
+        email_prefix: Only users whose email starts with this string
+        
+    Returns:
+        list: SQLAlchemy conditions (empty if no filter is set)
+        
+    Notes:
+        - LIKE wildcards in email_prefix are escaped, so it always matches literally
+    """
+    conditions = []
+    if is_role is not None:
+        conditions.append(User.is_role == is_role)
+    if is_active is not None:
+        conditions.append(User.is_active == is_active)
+    if email_prefix:
+        conditions.append(User.email.startswith(email_prefix, autoescape=True))
+    return conditions
+
 
-@admin_router.get("/users", response_model=List[dict])
+@admin_router.get("/users", response_model=list[dict])
 async def get_all_users(
-    current_user: User = Depends(require_permission("users", "read_all")),
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    after_id: int | None = Query(None, ge=0),
+    is_role: str | None = None,
+    is_active: bool | None = None,
+    email_prefix: str | None = Query(None, min_length=1, max_length=100),
+    current_user_id: int = Depends(authorize("users", "read_all")),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
-    Get list of all users.
+    Get a page of users ordered by ID.
     
     Args:
-        current_user: Authenticated user (requires 'read_all' permission for users)
-        db: Database session
+        request: Incoming request (used to build the next page link)
+        response: Response (carries the next page headers)
+        limit: Maximum number of users per page (1-500)
+        after_id: Cursor: return users with a greater ID (X-Next-Cursor of the previous page)
+        is_role: Only users with this role
+        is_active: Only active (true) or inactive (false) users
+        email_prefix: Only users whose email starts with this string
+        current_user_id: ID of the authenticated user (requires 'read_all' permission for users)
+        db: Read-only database session (replica if available)
+        
+    Returns:
+        list[dict]: Users with their details; unless this is the last page,
+        the X-Next-Cursor header holds after_id for the next page and the
+        Link header (rel="next") its URL
+        
+    Raises:
+        HTTPException: 403 if user lacks 'read_all' permission
+        
+    Notes:
+        - Keyset pagination: each page is an index range scan starting at
+          after_id, so deep pages cost the same as the first one
+        - Indexes on (is_role, id), (is_active, id) and email
+          (varchar_pattern_ops) back the filters
+    """
+    conditions = user_filters(is_role, is_active, email_prefix)
+    if after_id is not None:
+        conditions.append(User.id > after_id)
+
+    # One extra row tells whether another page follows
+    result = await db.execute(
+        select(*USER_LIST_COLUMNS).filter(*conditions).order_by(User.id).limit(limit + 1)
+    )
+    rows = result.all()
+
+    users = [dict(row._mapping) for row in rows[:limit]]
+    if len(rows) > limit:
+        next_cursor = users[-1]["id"]
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+        response.headers["Link"] = f'<{request.url.include_query_params(after_id=next_cursor)}>; rel="next"'
+    return users
+
+
+async def _stream_users(conditions: list, export_format: str) -> AsyncIterator[bytes]:
+    """
+    Stream users matching conditions as NDJSON lines or CSV rows.
+    
+    Args:
+        conditions: WHERE conditions from user_filters()
+        export_format: "ndjson" or "csv"
+        
+    Yields:
+        bytes: Encoded rows, EXPORT_CHUNK_SIZE rows per chunk (CSV starts with a header)
+        
+    Notes:
+        - Uses its own read-only session: request dependencies are closed
+          before a streaming response body is sent
+        - Rows come from a server-side cursor, so memory use does not depend
+          on the number of users
+    """
+    columns = [column.key for column in USER_LIST_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(columns)
+        yield buffer.getvalue().encode("utf-8")
+
+    async with get_read_sessionmaker()() as session:
+        result = await session.stream(
+            select(*USER_LIST_COLUMNS)
+            .filter(*conditions)
+            .order_by(User.id)
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            if export_format == "csv":
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode("utf-8")
+
+
+@admin_router.get("/users/export")
+async def export_users(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    is_role: str | None = None,
+    is_active: bool | None = None,
+    email_prefix: str | None = Query(None, min_length=1, max_length=100),
+    current_user_id: int = Depends(authorize("users", "read_all"))
+):
+    """
+    Export all users matching the filters as a streamed file.
+    
+    Args:
+        export_format: "ndjson" (one JSON object per line) or "csv"
+        is_role: Only users with this role
+        is_active: Only active (true) or inactive (false) users
+        email_prefix: Only users whose email starts with this string
+        current_user_id: ID of the authenticated user (requires 'read_all' permission for users)
+        
+    Returns:
+        StreamingResponse: Users ordered by ID with the columns of the user listing
+        
+    Raises:
+        HTTPException: 403 if user lacks 'read_all' permission
+        
+    Notes:
+        - Reads from a replica if available; a long export on a replica
+          can be cancelled by replication conflicts (max_standby_streaming_delay)
+    """
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_users(user_filters(is_role, is_active, email_prefix), export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{export_format}"'}
+    )
+
+
+@admin_router.get("/users/stats", response_model=dict)
+async def get_user_stats(
+    current_user_id: int = Depends(authorize("users", "read_all")),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get user counts per role and status.
+    
+    Args:
+        current_user_id: ID of the authenticated user (requires 'read_all' permission for users)
+        db: Read-only database session (replica if available)
         
     Returns:
-        List[dict]: List of all users with their details
+        dict: Exact 'total', 'active' and 'inactive' counts, 'by_role'
+        ({role: {"active": n, "inactive": n}}) and 'total_estimate'
+        (planner estimate from pg_class.reltuples, None before the first
+        ANALYZE)
         
     Raises:
         HTTPException: 403 if user lacks 'read_all' permission
+        
+    Notes:
+        - Exact counts come from the user_counts table, written by triggers
+          on users and compacted in the background (tools/user_counts.py),
+          so no users rows are scanned
+        - Users without a role are reported under ''
     """
-    result = await db.execute(select(User))
-    users = result.scalars().all()
+    result = await db.execute(
+        select(UserCount.is_role, UserCount.is_active, func.sum(UserCount.count))
+        .group_by(UserCount.is_role, UserCount.is_active)
+        .order_by(UserCount.is_role)
+    )
+    by_role = {}
+    totals = {"active": 0, "inactive": 0}
+    for role, is_active, count in result.all():
+        count = int(count)
+        if not count:
+            continue
+        state = "active" if is_active else "inactive"
+        by_role.setdefault(role, {"active": 0, "inactive": 0})[state] = count
+        totals[state] += count
+
+    estimate = await db.scalar(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass"))
 
-    return [
-        {
-            "id": user.id,
-            "email": user.email,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "patronymic": user.patronymic,
-            "is_active": user.is_active,
-            "is_role": user.is_role
-        }
-        for user in users
-    ]
+    return {
+        "total": totals["active"] + totals["inactive"],
+        "active": totals["active"],
+        "inactive": totals["inactive"],
+        "by_role": by_role,
+        "total_estimate": estimate if estimate and estimate > 0 else None,
+    }
 
 
 @admin_router.get("/users/{user_id}", response_model=dict)
 async def get_user_by_id(
     user_id: int,
-    current_user: User = Depends(require_permission("users", "read")),
-    db: AsyncSession = Depends(get_db)
+    current_user_id: int = Depends(authorize("users", "read")),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get user details by ID.
     
     Args:
         user_id: ID of user to retrieve
-        current_user: Authenticated user (requires 'read' permission for users)
-        db: Database session
+        current_user_id: ID of the authenticated user (requires 'read' permission for users)
+        db: Read-only database session (replica if available)
         
     Returns:
         dict: User details
@@ -77,8 +278,7 @@ async def get_user_by_id(
         HTTPException: 404 if user not found
         HTTPException: 403 if user lacks 'read' permission
     """
-    result = await db.execute(select(User).filter(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -101,7 +301,7 @@ async def get_user_by_id(
 async def update_user_role(
     user_id: int,
     new_role: str,
-    current_user: User = Depends(require_permission("users", "update")),
+    current_user_id: int = Depends(authorize("users", "update")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -110,7 +310,7 @@ async def update_user_role(
     Args:
         user_id: ID of user to update
         new_role: New role name to assign
-        current_user: Authenticated user (requires 'update' permission for users)
+        current_user_id: ID of the authenticated user (requires 'update' permission for users)
         db: Database session
         
     Returns:
@@ -120,8 +320,7 @@ async def update_user_role(
         HTTPException: 404 if user not found
         HTTPException: 403 if user lacks 'update' permission
     """
-    result = await db.execute(select(User).filter(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -129,9 +328,9 @@ async def update_user_role(
             detail="User not found"
         )
 
-    # Update user role
+    # Update user role and notify all workers
     user.is_role = new_role
-    await db.commit()
+    await publish_permission_change(db, f"user:{user_id}")
 
     return {"message": f"Role updated successfully for user {user_id}", "new_role": new_role}
 
@@ -139,7 +338,7 @@ async def update_user_role(
 @admin_router.put("/users/{user_id}/activate")
 async def activate_user(
     user_id: int,
-    current_user: User = Depends(require_permission("users", "update")),
+    current_user_id: int = Depends(authorize("users", "update")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -147,7 +346,7 @@ async def activate_user(
     
     Args:
         user_id: ID of user to activate
-        current_user: Authenticated user (requires 'update' permission for users)
+        current_user_id: ID of the authenticated user (requires 'update' permission for users)
         db: Database session
         
     Returns:
@@ -157,8 +356,7 @@ async def activate_user(
         HTTPException: 404 if user not found
         HTTPException: 403 if user lacks 'update' permission
     """
-    result = await db.execute(select(User).filter(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -167,7 +365,6 @@ async def activate_user(
         )
 
     user.is_active = True
-    await db.commit()
 
     return {"message": f"User {user_id} activated successfully"}
 
@@ -175,7 +372,7 @@ async def activate_user(
 @admin_router.put("/users/{user_id}/deactivate")
 async def deactivate_user(
     user_id: int,
-    current_user: User = Depends(require_permission("users", "update")),
+    current_user_id: int = Depends(authorize("users", "update")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -183,7 +380,7 @@ async def deactivate_user(
     
     Args:
         user_id: ID of user to deactivate
-        current_user: Authenticated user (requires 'update' permission for users)
+        current_user_id: ID of the authenticated user (requires 'update' permission for users)
         db: Database session
         
     Returns:
@@ -193,9 +390,11 @@ async def deactivate_user(
         HTTPException: 404 if user not found
         HTTPException: 400 if trying to deactivate yourself
         HTTPException: 403 if user lacks 'update' permission
+        
+    Notes:
+        - Revokes all refresh and access tokens of the user
     """
-    result = await db.execute(select(User).filter(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -204,14 +403,15 @@ async def deactivate_user(
         )
 
     # Prevent self-deactivation
-    if user.id == current_user.id:
+    if user.id == current_user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You cannot deactivate yourself"
         )
 
     user.is_active = False
-    await db.commit()
+    await revoke_refresh_tokens(user.id, db)
+    await revoke_user_access(user.id, db)
 
     return {"message": f"User {user_id} deactivated successfully"}
 
@@ -219,7 +419,7 @@ async def deactivate_user(
 @admin_router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
-    current_user: User = Depends(require_permission("users", "delete")),
+    current_user_id: int = Depends(authorize("users", "delete")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -227,7 +427,7 @@ async def delete_user(
     
     Args:
         user_id: ID of user to delete
-        current_user: Authenticated user (requires 'delete' permission for users)
+        current_user_id: ID of the authenticated user (requires 'delete' permission for users)
         db: Database session
         
     Returns:
@@ -237,9 +437,11 @@ async def delete_user(
         HTTPException: 404 if user not found
         HTTPException: 400 if trying to delete yourself
         HTTPException: 403 if user lacks 'delete' permission
+        
+    Notes:
+        - Revokes all refresh and access tokens of the user
     """
-    result = await db.execute(select(User).filter(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(
@@ -248,13 +450,238 @@ async def delete_user(
         )
 
     # Prevent self-deletion
-    if user.id == current_user.id:
+    if user.id == current_user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You cannot delete yourself"
         )
 
     await db.delete(user)
-    await db.commit()
+    await revoke_refresh_tokens(user.id, db)
+    await revoke_user_access(user.id, db)
 
     return {"message": f"User {user_id} deleted successfully"}
+
+
+async def _select_user_ids(selection: BulkUserSelection, db: AsyncSession) -> tuple[list[int], bool]:
+    """
+    Resolve the users of a bulk operation.
+    
+    Args:
+        selection: User IDs or filter
+        db: Database session
+        
+    Returns:
+        tuple[list[int], bool]: User IDs (request order, duplicates removed,
+        or ascending for a filter) and whether a filter matched more than
+        ADMIN_BULK_MAX_USERS users (only the first ones are selected)
+    """
+    if selection.ids is not None:
+        return list(dict.fromkeys(selection.ids)), False
+
+    user_filter = selection.filter
+    result = await db.execute(
+        select(User.id)
+        .filter(*user_filters(user_filter.is_role, user_filter.is_active, user_filter.email_prefix))
+        .order_by(User.id)
+        .limit(settings.ADMIN_BULK_MAX_USERS + 1)
+    )
+    user_ids = list(result.scalars())
+    return user_ids[:settings.ADMIN_BULK_MAX_USERS], len(user_ids) > settings.ADMIN_BULK_MAX_USERS
+
+
+def _id_in(user_ids: list[int]):
+    """
+    Build a "users.id = ANY(:user_ids)" condition with a single array parameter.
+    """
+    return User.id == any_(bindparam("user_ids", user_ids, type_=ARRAY(Integer)))
+
+
+def _bulk_result(
+    user_ids: list[int], changed: list[int], done: str, truncated: bool, skipped: set[int] | None = None
+) -> dict:
+    """
+    Build the response of a bulk operation.
+    
+    Args:
+        user_ids: Selected user IDs
+        changed: IDs of the users the statement changed
+        done: Status of changed users (e.g. "deactivated")
+        truncated: Whether the filter matched more users than were selected
+        skipped: IDs that were deliberately left unchanged
+        
+    Returns:
+        dict: 'results' ({"id", "status"} per selected user; status is done,
+        "not_found" or "skipped"), 'counts' per status and 'truncated'
+    """
+    changed = set(changed)
+    skipped = skipped or set()
+    counts = {done: 0, "not_found": 0, "skipped": 0}
+    results = []
+    for user_id in user_ids:
+        if user_id in skipped:
+            user_status = "skipped"
+        elif user_id in changed:
+            user_status = done
+        else:
+            user_status = "not_found"
+        counts[user_status] += 1
+        results.append({"id": user_id, "status": user_status})
+    return {"results": results, "counts": counts, "truncated": truncated}
+
+
+@admin_router.post("/users/bulk/role", response_model=dict)
+async def bulk_update_user_role(
+    role_update: BulkRoleUpdate,
+    current_user_id: int = Depends(authorize("users", "update")),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Assign a role to several users.
+    
+    Args:
+        role_update: Users (IDs or filter) and the new role
+        current_user_id: ID of the authenticated user (requires 'update' permission for users)
+        db: Database session
+        
+    Returns:
+        dict: Per-user results ("updated" or "not_found"), counts and
+        whether the filter selection was truncated
+        
+    Raises:
+        HTTPException: 403 if user lacks 'update' permission
+        HTTPException: 422 if neither or both of ids and filter are given
+        
+    Notes:
+        - One UPDATE ... WHERE id = ANY(...) RETURNING id, one permissions
+          version bump and one NOTIFY statement for all users
+    """
+    user_ids, truncated = await _select_user_ids(role_update, db)
+    result = await db.execute(
+        update(User)
+        .where(_id_in(user_ids))
+        .values(is_role=role_update.new_role)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    changed = result.scalars().all()
+    await publish_permission_changes(db, [f"user:{user_id}" for user_id in changed])
+
+    return _bulk_result(user_ids, changed, "updated", truncated)
+
+
+@admin_router.post("/users/bulk/activate", response_model=dict)
+async def bulk_activate_users(
+    selection: BulkUserSelection,
+    current_user_id: int = Depends(authorize("users", "update")),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Activate several user accounts.
+    
+    Args:
+        selection: Users (IDs or filter)
+        current_user_id: ID of the authenticated user (requires 'update' permission for users)
+        db: Database session
+        
+    Returns:
+        dict: Per-user results ("activated" or "not_found"), counts and
+        whether the filter selection was truncated
+        
+    Raises:
+        HTTPException: 403 if user lacks 'update' permission
+        HTTPException: 422 if neither or both of ids and filter are given
+    """
+    user_ids, truncated = await _select_user_ids(selection, db)
+    result = await db.execute(
+        update(User)
+        .where(_id_in(user_ids))
+        .values(is_active=True)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    return _bulk_result(user_ids, result.scalars().all(), "activated", truncated)
+
+
+@admin_router.post("/users/bulk/deactivate", response_model=dict)
+async def bulk_deactivate_users(
+    selection: BulkUserSelection,
+    current_user_id: int = Depends(authorize("users", "update")),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Deactivate several user accounts.
+    
+    Args:
+        selection: Users (IDs or filter)
+        current_user_id: ID of the authenticated user (requires 'update' permission for users)
+        db: Database session
+        
+    Returns:
+        dict: Per-user results ("deactivated", "not_found" or "skipped" for
+        the current user), counts and whether the filter selection was truncated
+        
+    Raises:
+        HTTPException: 403 if user lacks 'update' permission
+        HTTPException: 422 if neither or both of ids and filter are given
+        
+    Notes:
+        - Revokes all refresh and access tokens of the deactivated users
+          in the same transaction, with one statement each
+    """
+    user_ids, truncated = await _select_user_ids(selection, db)
+    targets = [user_id for user_id in user_ids if user_id != current_user_id]
+    result = await db.execute(
+        update(User)
+        .where(_id_in(targets))
+        .values(is_active=False)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    changed = result.scalars().all()
+    await revoke_users_refresh_tokens(changed, db)
+    await revoke_users_access(changed, db)
+
+    return _bulk_result(user_ids, changed, "deactivated", truncated, skipped={current_user_id})
+
+
+@admin_router.post("/users/bulk/delete", response_model=dict)
+async def bulk_delete_users(
+    selection: BulkUserSelection,
+    current_user_id: int = Depends(authorize("users", "delete")),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete several user accounts.
+    
+    Args:
+        selection: Users (IDs or filter)
+        current_user_id: ID of the authenticated user (requires 'delete' permission for users)
+        db: Database session
+        
+    Returns:
+        dict: Per-user results ("deleted", "not_found" or "skipped" for the
+        current user), counts and whether the filter selection was truncated
+        
+    Raises:
+        HTTPException: 403 if user lacks 'delete' permission
+        HTTPException: 422 if neither or both of ids and filter are given
+        
+    Notes:
+        - Revokes all refresh and access tokens of the deleted users in
+          the same transaction, with one statement each
+    """
+    user_ids, truncated = await _select_user_ids(selection, db)
+    targets = [user_id for user_id in user_ids if user_id != current_user_id]
+    result = await db.execute(
+        delete(User)
+        .where(_id_in(targets))
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    changed = result.scalars().all()
+    await revoke_users_refresh_tokens(changed, db)
+    await revoke_users_access(changed, db)
+
+    return _bulk_result(user_ids, changed, "deleted", truncated, skipped={current_user_id})
@@ -5,21 +5,25 @@ Endpoints for:
 - User registration
 - Login (access + refresh tokens)
 - Token refresh
-- Logout (token revocation)
+- Logout (token revocation), from one or all sessions
 - Expired token cleanup
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from datetime import datetime
-import datetime as D
 
 from database.models_db import User, RefreshToken
 from tools.schemas import UserRegister, UserLogin, TokenResponse, TokenRefreshRequest
-from tools.hash import get_password_hash, verify_password
-from tools.auth_func import create_access_token, create_refresh_token, decode_token, cleanup_expired_refresh_tokens
+from tools.hash import get_password_hash_async, verify_and_update_password_async, HashingOverloadedError
+from tools.auth_func import (
+    issue_access_token, create_refresh_token, decode_token, cleanup_expired_refresh_tokens, refresh_token_filter,
+    rotate_refresh_token, get_refresh_token_family, revoke_refresh_tokens, get_current_user, optional_security
+)
+from tools.revocation import revoke_access_token, revoke_user_access
 from database.database import get_db
+from config import settings
 
 auth_router = APIRouter(prefix="/authentication", tags=["Authentication"])
 
@@ -58,7 +62,7 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
         )
 
     # Hash password and create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -68,8 +72,6 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
     )
 
     db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
 
     return {"message": "User registered successfully"}
 
@@ -88,13 +90,35 @@ async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
         
     Raises:
         HTTPException: 401 if credentials invalid or user inactive
+        HTTPException: 503 if the password hashing queue is full
+        
+    Notes:
+        - Logins are shed (with Retry-After) instead of queued when more than
+          LOGIN_MAX_PENDING_VERIFICATIONS hashing jobs are pending, keeping
+          latency bounded for already admitted requests
+        - Stored hashes using an outdated scheme or cost are rehashed
     """
     # Find user by email
     result = await db.execute(select(User).filter(User.email == user_data.email))
     user = result.scalar_one_or_none()
 
     # Verify credentials
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    password_valid, new_hash = False, None
+    if user:
+        try:
+            password_valid, new_hash = await verify_and_update_password_async(
+                user_data.password,
+                user.hashed_password,
+                max_pending=settings.LOGIN_MAX_PENDING_VERIFICATIONS or None
+            )
+        except HashingOverloadedError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is overloaded, please retry later",
+                headers={"Retry-After": str(settings.LOGIN_RETRY_AFTER_SECONDS)}
+            )
+
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -109,11 +133,12 @@ async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    # Cleanup expired refresh tokens
-    await cleanup_expired_refresh_tokens(db)
+    # Transparently upgrade outdated password hashes (scheme or cost changed)
+    if new_hash:
+        user.hashed_password = new_hash
 
     # Generate tokens
-    access_token = create_access_token(user.id)
+    access_token = await issue_access_token(user, db)
     refresh_token = await create_refresh_token(user.id, db)
 
     return {
@@ -139,8 +164,9 @@ async def refresh_token_endpoint(refresh_request: TokenResponse, db: AsyncSessio
         HTTPException: 401 if token invalid, expired, or revoked
         
     Notes:
-        - Old refresh token is revoked (deleted)
-        - New refresh token is issued
+        - Old refresh token is revoked (deleted) and the new one stored
+          in a single statement, so a token can only be used once
+        - Reusing a rotated token revokes every token of its family
         - Checks both JWT expiration and database expires_at
     """
     # Decode and validate refresh token
@@ -162,33 +188,30 @@ async def refresh_token_endpoint(refresh_request: TokenResponse, db: AsyncSessio
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    # Find token in database
-    result = await db.execute(select(RefreshToken).filter(RefreshToken.token == refresh_request.refresh_token))
-    token_record = result.scalar_one_or_none()
-    
-    if not token_record:
+    # Replace the stored token (fails if revoked, already used or expired)
+    new_refresh_token = await rotate_refresh_token(refresh_request.refresh_token, payload, db)
+    if not new_refresh_token:
+        # A valid, unexpired token that is no longer stored has been used
+        # before: treat it as stolen and revoke its whole family
+        family_id = get_refresh_token_family(payload)
+        if family_id is not None:
+            await revoke_refresh_tokens(int(user_id), db, family_id=family_id)
+        await db.commit()  # Keep the revocations despite the error response
         raise HTTPException(
             status_code=401,
             detail="Refresh token revoked or expired"
         )
 
-    # Check expiration in database
-    now = datetime.now(D.timezone.utc)
-    if token_record.expires_at < now:
-        await db.delete(token_record)
-        await db.commit()
+    # Load token owner (needed for access token claims)
+    user = await db.get(User, int(user_id))
+    if not user:
         raise HTTPException(
-            status_code=401,
-            detail="Refresh token has expired"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
         )
 
-    # Revoke old token
-    await db.delete(token_record)
-    await db.commit()
-
-    # Generate new tokens
-    access_token = create_access_token(user_id)
-    new_refresh_token = await create_refresh_token(user_id, db)
+    access_token = await issue_access_token(user, db)
 
     return {
         "access_token": access_token,
@@ -198,27 +221,58 @@ async def refresh_token_endpoint(refresh_request: TokenResponse, db: AsyncSessio
 
 
 @auth_router.post("/logout")
-async def logout(logout_data: TokenRefreshRequest, db: AsyncSession = Depends(get_db)):
+async def logout(
+    logout_data: TokenRefreshRequest,
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_security),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Logout user and revoke refresh token.
     
     Args:
         logout_data: Refresh token to revoke
+        credentials: Optional access token (Authorization header) to revoke as well
         db: Database session
         
     Returns:
         dict: Success message
     """
-    result = await db.execute(select(RefreshToken).filter(RefreshToken.token == logout_data.refresh_token))
+    payload = decode_token(logout_data.refresh_token)
+    result = await db.execute(select(RefreshToken).filter(*refresh_token_filter(logout_data.refresh_token, payload)))
     token_record = result.scalar_one_or_none()
 
     if token_record:
         await db.delete(token_record)
-        await db.commit()
+
+    # Revoke the access token of the session, if presented
+    access_payload = decode_token(credentials.credentials) if credentials else None
+    if access_payload and access_payload.get("type") == "access":
+        await revoke_access_token(access_payload, db)
 
     return {"message": "Successfully logged out"}
 
 
+@auth_router.post("/logout-all")
+async def logout_all(user_id: int = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """
+    Logout from all sessions by revoking every refresh token of the user.
+    
+    Args:
+        user_id: ID of the authenticated user
+        db: Database session
+        
+    Returns:
+        dict: Success message and number of revoked tokens
+        
+    Notes:
+        - Access tokens issued so far are revoked as well
+    """
+    revoked_count = await revoke_refresh_tokens(user_id, db)
+    await revoke_user_access(user_id, db)
+
+    return {"message": "Successfully logged out from all sessions", "revoked_count": revoked_count}
+
+
 @auth_router.post("/cleanup-tokens")
 async def cleanup_tokens(db: AsyncSession = Depends(get_db)):
     """
@@ -232,7 +286,7 @@ async def cleanup_tokens(db: AsyncSession = Depends(get_db)):
         
     Notes:
         - Can be called manually for maintenance
-        - Also called automatically on login
+        - Expired tokens are also removed by the background sweeper
     """
     deleted_count = await cleanup_expired_refresh_tokens(db)
     return {"message": "Expired tokens cleaned up", "deleted_count": deleted_count}
@@ -16,8 +16,8 @@ from sqlalchemy.future import select
 from typing import List
 
 from database.models_db import BusinessElements, User
-from tools.auth_func import require_permission, get_current_user
-from database.database import get_db
+from tools.auth_func import authorize, get_current_user_record
+from database.database import get_db, get_read_db
 from tools.schemas import BusinessElementCreate, BusinessElementResponse, BusinessElementObject
 
 business_elements_router = APIRouter(prefix="/business-elements", tags=["Business Elements"])
@@ -25,15 +25,15 @@ business_elements_router = APIRouter(prefix="/business-elements", tags=["Busines
 
 @business_elements_router.get("/", response_model=List[BusinessElementResponse])
 async def get_all_business_elements(
-    current_user: User = Depends(require_permission("business_elements", "read_all")),
-    db: AsyncSession = Depends(get_db)
+    current_user_id: int = Depends(authorize("business_elements", "read_all")),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get list of all business elements.
     
     Args:
-        current_user: Authenticated user (requires 'read_all' permission for business_elements)
-        db: Database session
+        current_user_id: ID of the authenticated user (requires 'read_all' permission for business_elements)
+        db: Read-only database session (replica if available)
         
     Returns:
         List[BusinessElementResponse]: List of all business elements
@@ -57,16 +57,16 @@ async def get_all_business_elements(
 @business_elements_router.get("/{element_name}", response_model=BusinessElementResponse)
 async def get_business_element(
     element_name: str,
-    current_user: User = Depends(require_permission("business_elements", "read")),
-    db: AsyncSession = Depends(get_db)
+    current_user_id: int = Depends(authorize("business_elements", "read")),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get business element by name.
     
     Args:
         element_name: Name of the element to retrieve
-        current_user: Authenticated user (requires 'read' permission for business_elements)
-        db: Database session
+        current_user_id: ID of the authenticated user (requires 'read' permission for business_elements)
+        db: Read-only database session (replica if available)
         
     Returns:
         BusinessElementResponse: Business element details
@@ -94,7 +94,7 @@ async def get_business_element(
 @business_elements_router.post("/", response_model=BusinessElementResponse)
 async def create_business_element(
     element_data: BusinessElementCreate,
-    current_user: User = Depends(require_permission("business_elements", "create")),
+    current_user_id: int = Depends(authorize("business_elements", "create")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -102,7 +102,7 @@ async def create_business_element(
     
     Args:
         element_data: Business element data (name, roles)
-        current_user: Authenticated user (requires 'create' permission for business_elements)
+        current_user_id: ID of the authenticated user (requires 'create' permission for business_elements)
         db: Database session
         
     Returns:
@@ -129,8 +129,7 @@ async def create_business_element(
     )
 
     db.add(db_element)
-    await db.commit()
-    await db.refresh(db_element)
+    await db.flush()
 
     return {
         "id": db_element.id,
@@ -142,7 +141,7 @@ async def create_business_element(
 @business_elements_router.put("/{element_name}", response_model=BusinessElementObject)
 async def update_business_element(
     element_data: BusinessElementCreate,
-    current_user: User = Depends(require_permission("business_elements", "update")),
+    current_user_id: int = Depends(authorize("business_elements", "update")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -150,7 +149,7 @@ async def update_business_element(
     
     Args:
         element_data: New business element data
-        current_user: Authenticated user (requires 'update' permission for business_elements)
+        current_user_id: ID of the authenticated user (requires 'update' permission for business_elements)
         db: Database session
         
     Returns:
@@ -173,8 +172,6 @@ async def update_business_element(
     element.name = element_data.name
     element.roles = element_data.roles
     element.description = element_data.description
-    await db.commit()
-    await db.refresh(element)
 
     return {
         "id": element.id,
@@ -187,7 +184,7 @@ async def update_business_element(
 @business_elements_router.delete("/{element_name}", response_model=BusinessElementResponse)
 async def delete_business_element(
     element_name: str,
-    current_user: User = Depends(require_permission("business_elements", "delete")),
+    current_user_id: int = Depends(authorize("business_elements", "delete")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -195,7 +192,7 @@ async def delete_business_element(
     
     Args:
         element_name: Name of the element to delete
-        current_user: Authenticated user (requires 'delete' permission for business_elements)
+        current_user_id: ID of the authenticated user (requires 'delete' permission for business_elements)
         db: Database session
         
     Returns:
@@ -215,7 +212,6 @@ async def delete_business_element(
         )
 
     await db.delete(element)
-    await db.commit()
 
     return {
         "id": element.id,
@@ -227,8 +223,8 @@ async def delete_business_element(
 @business_elements_router.get("/{element_name}/", response_model=BusinessElementObject)
 async def view_business_element_object(
     element_name: str,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_user_record),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     View business element object (with role-based access control).
@@ -239,7 +235,7 @@ async def view_business_element_object(
     Args:
         element_name: Name of the element to view
         current_user: Authenticated user (any valid token)
-        db: Database session
+        db: Read-only database session (replica if available)
         
     Returns:
         BusinessElementObject: Element description
@@ -251,10 +247,6 @@ async def view_business_element_object(
     # Get business element
     result = await db.execute(select(BusinessElements).filter(BusinessElements.name == element_name))
     element = result.scalar_one_or_none()
-    
-    # Get current user data
-    result = await db.execute(select(User).filter(User.id == current_user.id))
-    user_data = result.scalar_one_or_none()
 
     if not element:
         raise HTTPException(
@@ -262,17 +254,11 @@ async def view_business_element_object(
             detail="Business element not found"
         )
 
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-
     # Check if user's role has access to this element
-    if user_data.is_role not in element.roles:
+    if current_user.is_role not in element.roles:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail=f"Access denied. Role '{user_data.is_role}' does not have permission to view this element."
+            detail=f"Access denied. Role '{current_user.is_role}' does not have permission to view this element."
         )
 
     return {
@@ -13,25 +13,26 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from database.models_db import Permissions, User
+from database.models_db import Permissions
 from tools.schemas import PermissionCreate, PermissionResponse
-from database.database import get_db
-from tools.auth_func import require_permission
+from database.database import get_db, get_read_db, after_commit
+from tools.auth_func import authorize
+from tools.permission_cache import set_role_permissions, remove_role_permissions, publish_permission_change, publish_permission_changes
 
 permission_router = APIRouter(prefix="/permissions", tags=["Permissions"])
 
 
 @permission_router.get("/", response_model=list[PermissionResponse])
 async def get_all_permissions(
-    current_user: User = Depends(require_permission("permissions", "read_all")),
-    db: AsyncSession = Depends(get_db)
+    current_user_id: int = Depends(authorize("permissions", "read_all")),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get all permission records.
     
     Args:
-        current_user: Authenticated user (requires 'read_all' permission for permissions)
-        db: Database session
+        current_user_id: ID of the authenticated user (requires 'read_all' permission for permissions)
+        db: Read-only database session (replica if available)
         
     Returns:
         list[PermissionResponse]: List of all permission records
@@ -69,7 +70,7 @@ async def get_all_permissions(
 @permission_router.post("/{role_name}", response_model=PermissionResponse)
 async def create_permission(
     permission_data: PermissionCreate,
-    current_user: User = Depends(require_permission("permissions", "create")),
+    current_user_id: int = Depends(authorize("permissions", "create")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -77,7 +78,7 @@ async def create_permission(
     
     Args:
         permission_data: Permission data including role name and all permission flags
-        current_user: Authenticated user (requires 'create' permission for permissions)
+        current_user_id: ID of the authenticated user (requires 'create' permission for permissions)
         db: Database session
         
     Returns:
@@ -118,8 +119,11 @@ async def create_permission(
     )
 
     db.add(db_permission)
-    await db.commit()
-    await db.refresh(db_permission)
+    await db.flush()
+    await publish_permission_change(db, f"role:{db_permission.role_name}")
+
+    # Update in-memory permission matrix once committed
+    after_commit(db, lambda: set_role_permissions(db_permission))
 
     return {
         "id": db_permission.id,
@@ -145,16 +149,16 @@ async def create_permission(
 @permission_router.get("/{role_name}", response_model=PermissionResponse)
 async def get_permissions_by_role(
     role_name: str,
-    current_user: User = Depends(require_permission("permissions", "read")),
-    db: AsyncSession = Depends(get_db)
+    current_user_id: int = Depends(authorize("permissions", "read")),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get permissions for a specific role.
     
     Args:
         role_name: Name of the role to get permissions for
-        current_user: Authenticated user (requires 'read' permission for permissions)
-        db: Database session
+        current_user_id: ID of the authenticated user (requires 'read' permission for permissions)
+        db: Read-only database session (replica if available)
         
     Returns:
         PermissionResponse: Permission record for the role
@@ -197,7 +201,7 @@ async def get_permissions_by_role(
 async def update_permissions_by_role(
     role_name: str,
     permission_data: PermissionCreate,
-    current_user: User = Depends(require_permission("permissions", "update")),
+    current_user_id: int = Depends(authorize("permissions", "update")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -206,7 +210,7 @@ async def update_permissions_by_role(
     Args:
         role_name: Name of the role to update
         permission_data: New permission data
-        current_user: Authenticated user (requires 'update' permission for permissions)
+        current_user_id: ID of the authenticated user (requires 'update' permission for permissions)
         db: Database session
         
     Returns:
@@ -243,7 +247,13 @@ async def update_permissions_by_role(
     permission.update_business_elements = permission_data.update_business_elements
     permission.delete_business_elements = permission_data.delete_business_elements
 
-    await db.commit()
+    # Notify other workers about both the old and the new role name (one version bump)
+    role_names = dict.fromkeys([role_name, permission.role_name])
+    await publish_permission_changes(db, [f"role:{name}" for name in role_names])
+
+    # Update in-memory permission matrix once committed (role may have been renamed)
+    after_commit(db, lambda: remove_role_permissions(role_name))
+    after_commit(db, lambda: set_role_permissions(permission))
 
     return {
         "id": permission.id,
@@ -269,7 +279,7 @@ async def update_permissions_by_role(
 @permission_router.delete("/{role_name}")
 async def delete_permissions_by_role(
     role_name: str,
-    current_user: User = Depends(require_permission("permissions", "delete")),
+    current_user_id: int = Depends(authorize("permissions", "delete")),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -277,7 +287,7 @@ async def delete_permissions_by_role(
     
     Args:
         role_name: Name of the role to delete permissions for
-        current_user: Authenticated user (requires 'delete' permission for permissions)
+        current_user_id: ID of the authenticated user (requires 'delete' permission for permissions)
         db: Database session
         
     Returns:
@@ -297,6 +307,9 @@ async def delete_permissions_by_role(
         )
 
     await db.delete(permission)
-    await db.commit()
+    await publish_permission_change(db, f"role:{role_name}")
+
+    # Update in-memory permission matrix once committed
+    after_commit(db, lambda: remove_role_permissions(role_name))
 
     return {"message": f"Permissions for role '{role_name}' deleted successfully"}
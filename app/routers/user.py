@@ -9,10 +9,10 @@ Endpoints for user self-management:
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from database.models_db import User
-from tools.auth_func import require_permission
+from tools.auth_func import require_permission, revoke_refresh_tokens
+from tools.revocation import revoke_user_access
 from database.database import get_db
 
 user_router = APIRouter(prefix="/profile", tags=["User Panel"])
@@ -20,41 +20,32 @@ user_router = APIRouter(prefix="/profile", tags=["User Panel"])
 
 @user_router.get("/")
 async def get_profile(
-    current_user: User = Depends(require_permission("users", "read")),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(require_permission("users", "read"))
 ):
     """
     Get current user's profile information.
     
     Args:
         current_user: Authenticated user (requires 'read' permission for users)
-        db: Database session
         
     Returns:
         dict: User profile data
         
     Raises:
         HTTPException: 404 if user not found
+        
+    Notes:
+        - Uses the user record already loaded for the permission check
     """
-    result = await db.execute(select(User).filter(User.id == current_user.id))
-    user_data = result.scalar_one_or_none()
-
-    if user_data:
-        return {
-            "id": user_data.id,
-            "first_name": user_data.first_name,
-            "last_name": user_data.last_name,
-            "patronymic": user_data.patronymic,
-            "email": user_data.email,
-            "is_active": user_data.is_active,
-            "is_role": user_data.is_role,
-        }
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"}
-        )
+    return {
+        "id": current_user.id,
+        "first_name": current_user.first_name,
+        "last_name": current_user.last_name,
+        "patronymic": current_user.patronymic,
+        "email": current_user.email,
+        "is_active": current_user.is_active,
+        "is_role": current_user.is_role,
+    }
 
 
 @user_router.put("/delete")
@@ -77,20 +68,17 @@ async def deactivate_account(
         
     Notes:
         - Admin accounts cannot be deactivated
-        - Sets is_active to False
+        - Sets is_active to False and revokes all refresh and access tokens
     """
-    if current_user:
-        result = await db.execute(select(User).filter(User.id == current_user.id))
-        user = result.scalar_one_or_none()
-
-        # Prevent admin deactivation
-        if user.is_role == "admin":
-            return {"message": "Admin cannot be deactivated"}
+    # Prevent admin deactivation
+    if current_user.is_role == "admin":
+        return {"message": "Admin cannot be deactivated"}
 
-        user.is_active = False
-        await db.commit()
+    current_user.is_active = False
+    await revoke_refresh_tokens(current_user.id, db)
+    await revoke_user_access(current_user.id, db)
 
-        return {"message": "Account deactivated successfully"}
+    return {"message": "Account deactivated successfully"}
 
 
 @user_router.put("/update/{parameter}")
@@ -120,19 +108,14 @@ async def update_profile(
         - Only updates string fields
         - Does not validate field values
     """
-    if current_user:
-        result = await db.execute(select(User).filter(User.id == current_user.id))
-        user = result.scalar_one_or_none()
-
-        # Check if parameter exists
-        if not hasattr(user, parameter):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Parameter '{parameter}' does not exist in User model"
-            )
+    # Check if parameter exists
+    if not hasattr(current_user, parameter):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Parameter '{parameter}' does not exist in User model"
+        )
 
-        # Update field
-        setattr(user, parameter, value)
-        await db.commit()
+    # Update field
+    setattr(current_user, parameter, value)
 
-        return {"message": f"{parameter} updated successfully"}
+    return {"message": f"{parameter} updated successfully"}
@@ -0,0 +1,33 @@
+"""
+Well-Known Endpoints Router.
+
+Endpoints for token consumers:
+- JSON Web Key Set with the public keys used to sign access tokens
+"""
+
+from fastapi import APIRouter, Response
+
+from config import settings
+from tools.signing_keys import get_jwks
+
+well_known_router = APIRouter(prefix="/.well-known", tags=["Well-Known"])
+
+
+@well_known_router.get("/jwks.json")
+async def jwks(response: Response):
+    """
+    Get the public keys for verifying tokens issued by this service.
+    
+    Args:
+        response: Response used to set caching headers
+        
+    Returns:
+        dict: JSON Web Key Set ({"keys": [...]}), empty for HMAC algorithms
+        
+    Notes:
+        - Cacheable for JWKS_MAX_AGE_SECONDS; new keys are published at least
+          that long before they are used for signing
+        - Consumers should select the key by the token's 'kid' header
+    """
+    response.headers["Cache-Control"] = f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}"
+    return get_jwks()
@@ -0,0 +1,74 @@
+"""
+Access token revocation tests.
+
+Run from the app directory:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+from datetime import datetime
+import datetime as D
+
+from tools import revocation
+from tools.auth_func import create_access_token, decode_token
+
+
+class FakeResult:
+    """Query result returning fixed (key, revoked_at) rows."""
+
+    def __init__(self, rows: list[tuple]):
+        self.rows = rows
+
+    def all(self) -> list[tuple]:
+        return self.rows
+
+
+class FakeSession:
+    """Session answering every revocation lookup with the same rows."""
+
+    def __init__(self, rows: list[tuple]):
+        self.rows = rows
+
+    async def execute(self, statement):
+        return FakeResult(self.rows)
+
+
+class UserRevocationTest(unittest.TestCase):
+    """
+    Revocation of all tokens of a user ("user:<id>" entry).
+    """
+
+    def setUp(self):
+        # Check every token against the table, without a Bloom filter
+        self.saved_filter, revocation._filter = revocation._filter, None
+
+    def tearDown(self):
+        revocation._filter = self.saved_filter
+
+    def is_revoked(self, token: str, revoked_at: datetime) -> bool:
+        session = FakeSession([("user:1", revoked_at)])
+        return asyncio.run(revocation.is_access_token_revoked(decode_token(token), session))
+
+    def test_token_issued_before_revocation_is_revoked(self):
+        token = create_access_token(1)
+        revoked_at = datetime.now(D.timezone.utc)
+        self.assertTrue(self.is_revoked(token, revoked_at))
+
+    def test_token_reissued_right_after_revocation_is_valid(self):
+        revoked_at = datetime.now(D.timezone.utc)
+        token = create_access_token(1)
+        # Usually issued within the same second as the revocation
+        self.assertFalse(self.is_revoked(token, revoked_at))
+
+    def test_token_without_iat_us_is_revoked_within_revocation_second(self):
+        revoked_at = datetime.now(D.timezone.utc)
+        payload = decode_token(create_access_token(1))
+        del payload["iat_us"]
+        payload["iat"] = int(revoked_at.timestamp())
+        session = FakeSession([("user:1", revoked_at)])
+        self.assertTrue(asyncio.run(revocation.is_access_token_revoked(payload, session)))
+
+
+if __name__ == "__main__":
+    unittest.main()
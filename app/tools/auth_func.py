@@ -3,34 +3,64 @@ Authentication and Authorization Functions.
 
 This module provides:
 - JWT token creation and decoding
-- Refresh token management with database storage
-- Current user extraction from tokens
-- Permission checking for RBAC
+- Refresh token management with database storage (rotation, token
+  families with reuse detection, per-user revocation)
+- Current user extraction from tokens (with a verified-token cache)
+- Permission checking for RBAC (optionally from token claims)
 - Expired token cleanup
 """
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import datetime as D
+import hashlib
+import threading
+import time
+import uuid
 from config import settings
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.future import select
-from sqlalchemy import delete
-from database.models_db import User, Permissions, RefreshToken
+from database.models_db import User, RefreshToken
 from database.database import get_db
+from sqlalchemy import ARRAY, Integer, Uuid, any_, bindparam, delete, func, insert, literal
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from tools.signing_keys import encode_token, decode_jwt
+from tools.token_sweeper import delete_expired_refresh_tokens_batch
+from tools.revocation import is_access_token_revoked, to_microseconds
+from tools.permission_cache import get_role_mask, get_permission_bit, get_permissions_version
 
 # HTTP Bearer token security scheme
 security = HTTPBearer()
 
+# Same scheme for endpoints where the token is optional
+optional_security = HTTPBearer(auto_error=False)
+
+# Verified access token cache: SHA-256 of token -> decoded payload (LRU order)
+_token_cache: OrderedDict[bytes, dict] = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_cache_stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+}
+
 
-def create_access_token(user_id: int) -> str:
+def create_access_token(
+    user_id: int,
+    role: str | None = None,
+    permissions: int | None = None,
+    permissions_version: int | None = None
+) -> str:
     """
     Create a JWT access token.
     
     Args:
         user_id: ID of the user to create token for
+        role: User's role to embed in 'role' claim (optional)
+        permissions: Role permission bitmask to embed in 'perms' claim (optional)
+        permissions_version: Permissions version to embed in 'pv' claim (optional)
         
     Returns:
         str: Encoded JWT access token
@@ -39,53 +69,254 @@ def create_access_token(user_id: int) -> str:
         - Token expires after ACCESS_TOKEN_EXPIRE_MINUTES
         - Contains user ID in 'sub' claim
         - Token type is 'access'
+        - 'jti' and 'iat_us' (issue time in microseconds) claims allow
+          revocation (see tools/revocation.py)
+        - Permission claims are only embedded if role is given
     """
-    expire = datetime.now(D.timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    now = datetime.now(D.timezone.utc)
+    expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {
         "sub": str(user_id),
+        "iat": int(now.timestamp()),
+        "iat_us": to_microseconds(now),
         "exp": int(expire.timestamp()),
-        "type": "access"
+        "type": "access",
+        "jti": uuid.uuid4().hex
     }
-    token = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    if role is not None:
+        payload["role"] = role
+        payload["perms"] = permissions or 0
+        payload["pv"] = permissions_version
+    token = encode_token(payload)
     return token
 
 
+async def issue_access_token(user: User, db: AsyncSession) -> str:
+    """
+    Create an access token for a user, embedding permission claims if enabled.
+    
+    Args:
+        user: User to create token for
+        db: Database session (used only if the role is not cached)
+        
+    Returns:
+        str: Encoded JWT access token
+        
+    Notes:
+        - Claims are embedded only when TOKEN_EMBED_PERMISSIONS is enabled
+          and the permissions version is known
+    """
+    version = get_permissions_version()
+    if not settings.TOKEN_EMBED_PERMISSIONS or version is None:
+        return create_access_token(user.id)
+
+    # Read the version before the mask, so the claims are never newer than 'pv'
+    mask = await get_role_mask(user.is_role, db)
+    return create_access_token(
+        user.id,
+        role=user.is_role,
+        permissions=mask,
+        permissions_version=version
+    )
+
+
+def refresh_token_filter(token: str, payload: dict | None = None) -> list:
+    """
+    Build the conditions selecting the stored record of a refresh token.
+    
+    Args:
+        token: JWT refresh token string
+        payload: Decoded token payload, if available
+        
+    Returns:
+        list: SQLAlchemy filter conditions for RefreshToken
+        
+    Notes:
+        - With REFRESH_TOKENS_PARTITIONED the expiry from the payload is
+          included, so the lookup only touches one partition
+    """
+    conditions = [RefreshToken.token_hash == hash_refresh_token(token)]
+    if settings.REFRESH_TOKENS_PARTITIONED and payload and "exp" in payload:
+        conditions.append(RefreshToken.expires_at == datetime.fromtimestamp(payload["exp"], D.timezone.utc))
+    return conditions
+
+
+def hash_refresh_token(token: str) -> bytes:
+    """
+    Compute the digest under which a refresh token is stored.
+    
+    Args:
+        token: JWT refresh token string
+        
+    Returns:
+        bytes: SHA-256 digest (32 bytes)
+    """
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def _encode_refresh_token(user_id: int, family_id: uuid.UUID) -> tuple[str, datetime]:
+    """
+    Encode a new JWT refresh token.
+    
+    Args:
+        user_id: ID of the token owner
+        family_id: Token family (login session), stored in the 'fam' claim
+        
+    Returns:
+        tuple[str, datetime]: Encoded token and its expiration time
+    """
+    # Whole seconds, so expires_at matches the token's 'exp' claim exactly
+    expire = (datetime.now(D.timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)).replace(microsecond=0)
+    payload = {
+        "sub": str(user_id),
+        "exp": int(expire.timestamp()),
+        "type": "refresh",
+        "fam": family_id.hex,
+        # Unique ID: tokens issued within the same second must not be identical
+        "jti": uuid.uuid4().hex
+    }
+    return encode_token(payload), expire
+
+
 async def create_refresh_token(user_id: int, db: AsyncSession) -> str:
     """
     Create a JWT refresh token and store it in the database.
     
     Args:
         user_id: ID of the user to create token for
-        db: Database session
+        db: Database session (the caller commits)
         
     Returns:
         str: Encoded JWT refresh token
         
     Notes:
         - Token expires after REFRESH_TOKEN_EXPIRE_DAYS
-        - Stored in database for revocation support
+        - Stored in database (as a SHA-256 digest) for revocation support
         - Contains expiration timestamp in expires_at field
+        - Starts a new token family; rotations of this token stay in it
     """
-    expire = datetime.now(D.timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    payload = {
-        "sub": str(user_id),
-        "exp": int(expire.timestamp()),
-        "type": "refresh"
-    }
-    token = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    family_id = uuid.uuid4()
+    token, expire = _encode_refresh_token(user_id, family_id)
 
     db_token = RefreshToken(
         user_id=user_id,
-        token=token,
+        family_id=family_id,
+        token_hash=hash_refresh_token(token),
         expires_at=expire
     )
 
     db.add(db_token)
-    await db.commit()
 
     return token
 
 
+async def rotate_refresh_token(token: str, payload: dict, db: AsyncSession) -> str | None:
+    """
+    Replace a stored refresh token with a new one in a single statement.
+    
+    Args:
+        token: Presented (already verified) JWT refresh token
+        payload: Decoded payload of the presented token
+        db: Database session (the caller commits)
+        
+    Returns:
+        str | None: New refresh token, or None if the presented token is
+        not stored (revoked or already rotated) or has expired
+        
+    Notes:
+        - The old row is deleted and the new one inserted by one
+          DELETE ... RETURNING / INSERT ... SELECT statement
+        - Of concurrent rotations of the same token only one finds the row;
+          the others wait for its lock and then see it deleted
+        - An expired row is deleted without inserting a replacement
+        - The new token stays in the family of the presented one (tokens
+          issued before families existed start a new family)
+    """
+    user_id = int(payload["sub"])
+    family_id = get_refresh_token_family(payload) or uuid.uuid4()
+    new_token, expire = _encode_refresh_token(user_id, family_id)
+
+    old = (
+        delete(RefreshToken)
+        .where(*refresh_token_filter(token, payload))
+        .returning(RefreshToken.user_id, RefreshToken.expires_at)
+        .cte("old")
+    )
+    rotated = await db.scalar(
+        insert(RefreshToken)
+        .from_select(
+            ["user_id", "family_id", "token_hash", "expires_at"],
+            select(old.c.user_id, literal(family_id, Uuid), literal(hash_refresh_token(new_token)), literal(expire))
+            .where(old.c.user_id == user_id, old.c.expires_at > func.now())
+        )
+        .returning(RefreshToken.user_id)
+        .add_cte(old)
+    )
+    return new_token if rotated is not None else None
+
+
+def get_refresh_token_family(payload: dict) -> uuid.UUID | None:
+    """
+    Get the token family from a refresh token payload.
+    
+    Args:
+        payload: Decoded refresh token payload
+        
+    Returns:
+        uuid.UUID | None: Family ID, or None for tokens without a valid 'fam' claim
+    """
+    try:
+        return uuid.UUID(hex=payload["fam"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+async def revoke_refresh_tokens(user_id: int, db: AsyncSession, family_id: uuid.UUID | None = None) -> int:
+    """
+    Revoke all refresh tokens of a user, or of one of their token families.
+    
+    Args:
+        user_id: ID of the token owner
+        db: Database session (the caller commits)
+        family_id: Family to revoke; all families if None
+        
+    Returns:
+        int: Number of revoked tokens
+        
+    Notes:
+        - A single DELETE using the (user_id, family_id) index
+    """
+    statement = delete(RefreshToken).where(RefreshToken.user_id == user_id)
+    if family_id is not None:
+        statement = statement.where(RefreshToken.family_id == family_id)
+    result = await db.execute(statement.execution_options(synchronize_session=False))
+    return result.rowcount or 0
+
+
+async def revoke_users_refresh_tokens(user_ids: list[int], db: AsyncSession) -> int:
+    """
+    Revoke all refresh tokens of several users.
+    
+    Args:
+        user_ids: IDs of the token owners
+        db: Database session (the caller commits)
+        
+    Returns:
+        int: Number of revoked tokens
+        
+    Notes:
+        - A single DELETE ... WHERE user_id = ANY(...) with one array parameter
+    """
+    if not user_ids:
+        return 0
+    result = await db.execute(
+        delete(RefreshToken)
+        .where(RefreshToken.user_id == any_(bindparam("user_ids", user_ids, type_=ARRAY(Integer))))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
 async def cleanup_expired_refresh_tokens(db: AsyncSession) -> int:
     """
     Delete all expired refresh tokens from the database.
@@ -97,16 +328,17 @@ async def cleanup_expired_refresh_tokens(db: AsyncSession) -> int:
         int: Number of deleted tokens
         
     Notes:
-        - Called automatically on login
+        - Normally done by the background sweeper (tools/token_sweeper.py)
         - Can be called manually via /authentication/cleanup-tokens
-        - Helps maintain database size
+        - Deletes in batches of TOKEN_SWEEP_BATCH_SIZE, committing after each
     """
-    now = datetime.now(D.timezone.utc)
-    result = await db.execute(
-        delete(RefreshToken).where(RefreshToken.expires_at < now)
-    )
-    await db.commit()
-    return result.rowcount or 0
+    deleted = 0
+    while True:
+        batch = await delete_expired_refresh_tokens_batch(db, settings.TOKEN_SWEEP_BATCH_SIZE)
+        await db.commit()
+        deleted += batch
+        if batch == 0 or batch < settings.TOKEN_SWEEP_BATCH_SIZE:
+            return deleted
 
 
 def decode_token(token: str) -> dict | None:
@@ -124,7 +356,7 @@ def decode_token(token: str) -> dict | None:
         - Does not raise exceptions (handled internally)
     """
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_jwt(token)
         return payload
     except jwt.ExpiredSignatureError:
         # Token has expired
@@ -134,27 +366,97 @@ def decode_token(token: str) -> dict | None:
         return None
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> int:
+def decode_token_cached(token: str) -> dict | None:
+    """
+    Decode and validate a JWT token, reusing earlier verifications.
+    
+    Args:
+        token: JWT token string to decode
+        
+    Returns:
+        dict | None: Decoded payload if valid, None otherwise
+        
+    Notes:
+        - Keyed by SHA-256 of the token; entries are kept until the token's
+          'exp', so a hit is exactly as valid as a fresh decode
+        - Bounded to TOKEN_CACHE_SIZE entries (least recently used evicted)
+        - Invalid tokens are not cached
+    """
+    if settings.TOKEN_CACHE_SIZE <= 0:
+        return decode_token(token)
+
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+
+    with _token_cache_lock:
+        payload = _token_cache.get(key)
+        if payload is not None:
+            if payload["exp"] > now:
+                _token_cache.move_to_end(key)
+                _token_cache_stats["hits"] += 1
+                return payload
+            del _token_cache[key]
+        _token_cache_stats["misses"] += 1
+
+    payload = decode_token(token)
+    if payload is None or "exp" not in payload:
+        return payload
+
+    with _token_cache_lock:
+        _token_cache[key] = payload
+        _token_cache.move_to_end(key)
+        while len(_token_cache) > settings.TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+            _token_cache_stats["evictions"] += 1
+
+    return payload
+
+
+def get_token_cache_stats() -> dict:
     """
-    Extract and validate current user ID from JWT access token.
+    Get verified token cache metrics.
+    
+    Returns:
+        dict: Size, capacity, hits, misses, evictions and hit ratio
+    """
+    with _token_cache_lock:
+        hits = _token_cache_stats["hits"]
+        lookups = hits + _token_cache_stats["misses"]
+        return {
+            "size": len(_token_cache),
+            "capacity": settings.TOKEN_CACHE_SIZE,
+            "hits": hits,
+            "misses": _token_cache_stats["misses"],
+            "evictions": _token_cache_stats["evictions"],
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+async def get_token_payload(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> dict:
+    """
+    Extract and validate the payload of the JWT access token.
     
     Args:
         credentials: HTTP Bearer credentials from request
+        db: Database session (used only if the token may be revoked)
         
     Returns:
-        int: User ID from token
+        dict: Verified token payload
         
     Raises:
-        HTTPException: 401 if token is invalid, expired, or wrong type
+        HTTPException: 401 if token is invalid, expired, revoked, or wrong type
         
     Notes:
         - Only accepts 'access' token type
-        - Returns user ID as integer
+        - Decoded once per request (FastAPI caches dependencies)
+        - Repeated tokens are served from the verified-token cache
+        - Revocation is checked against the per-worker Bloom filter first
     """
     token = credentials.credentials
-    payload = decode_token(token)
+    payload = decode_token_cached(token)
 
     # Check if token is valid and not expired
     if not payload:
@@ -181,12 +483,103 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if await is_access_token_revoked(payload, db):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return payload
+
+
+def get_current_user(payload: dict = Depends(get_token_payload)) -> int:
+    """
+    Extract current user ID from JWT access token.
+    
+    Args:
+        payload: Verified access token payload
+        
+    Returns:
+        int: User ID from token
+    """
     # Return user ID as integer
-    return int(user_id)
+    return int(payload["sub"])
+
+
+def check_token_permission(payload: dict, resource: str, action: str) -> bool:
+    """
+    Check permission using the claims embedded in an access token.
+    
+    Args:
+        payload: Verified access token payload
+        resource: Resource name ('users', 'permissions', 'business_elements')
+        action: Action name ('create', 'read', 'read_all', 'update', 'delete')
+        
+    Returns:
+        bool: True if granted by the token, False if the token has no
+        claims or they are stale (caller must fall back to the database)
+        
+    Raises:
+        HTTPException: 403 if up-to-date claims deny the permission
+        
+    Notes:
+        - Claims are trusted only while their 'pv' equals the current
+          permissions version (any role or permission change bumps it)
+    """
+    role = payload.get("role")
+    version = get_permissions_version()
+    if role is None or version is None or payload.get("pv") != version:
+        return False
+
+    # Admin role has full access
+    if role == "admin":
+        return True
+
+    permission_bit = get_permission_bit(resource, action)
+    if permission_bit is None or not payload.get("perms", 0) & permission_bit:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Access denied. Role '{role}' does not have permission to {action} {resource}."
+        )
+    return True
+
+
+async def get_current_user_record(
+    user_id: int = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """
+    Load the authenticated user's record once per request.
+    
+    Args:
+        user_id: User ID from access token
+        db: Database session
+        
+    Returns:
+        User: Current user
+        
+    Raises:
+        HTTPException: 404 if user not found
+        
+    Notes:
+        - FastAPI caches dependencies per request, and the session is shared,
+          so the permission check and the endpoint get the same instance
+        - Later db.get(User, ...) calls for this ID hit the identity map
+    """
+    user = await db.get(User, user_id)
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+    return user
 
 
 async def check_permission(
-    user_id: int,
+    user: User,
     resource: str,
     action: str,
     db: AsyncSession
@@ -195,7 +588,7 @@ async def check_permission(
     Check if user has permission to perform action on resource.
     
     Args:
-        user_id: ID of the user to check
+        user: User to check
         resource: Resource name ('users', 'permissions', 'business_elements')
         action: Action name ('create', 'read', 'read_all', 'update', 'delete')
         db: Database session
@@ -204,50 +597,38 @@ async def check_permission(
         bool: True if permission granted
         
     Raises:
-        HTTPException: 404 if user not found, 403 if permission denied
+        HTTPException: 403 if permission denied
         
     Notes:
         - Admin role bypasses all permission checks
         - Permission attribute format: {action}_{resource}
+        - Role permissions are read from the in-memory permission matrix
     """
-    # Get user from database
-    user_result = await db.execute(select(User).filter(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-
     # Admin role has full access
     if user.is_role == "admin":
         return True
 
-    # Get permissions for user's role
-    permission_result = await db.execute(
-        select(Permissions).filter(Permissions.role_name == user.is_role)
-    )
-    permission = permission_result.scalar_one_or_none()
+    # Get compiled permissions for user's role
+    role_mask = await get_role_mask(user.is_role, db)
 
-    if not permission:
+    if role_mask is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"No permissions defined for role '{user.is_role}'"
         )
 
-    # Build permission attribute name
-    permission_attr = f"{action}_{resource}"
+    # Get bit for permission attribute {action}_{resource}
+    permission_bit = get_permission_bit(resource, action)
 
     # Check if permission attribute exists
-    if not hasattr(Permissions, permission_attr):
+    if permission_bit is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail=f"Permission attribute '{permission_attr}' not found"
+            detail=f"Permission attribute '{action}_{resource}' not found"
         )
 
-    # Get permission value
-    has_permission = getattr(permission, permission_attr, False)
+    # Check permission bit
+    has_permission = bool(role_mask & permission_bit)
 
     if not has_permission:
         raise HTTPException(
@@ -258,6 +639,64 @@ async def check_permission(
     return True
 
 
+def _permission_check(resource: str, action: str):
+    """
+    Create a dependency checking a permission, loading the user only if needed.
+    
+    Args:
+        resource: Resource name ('users', 'permissions', 'business_elements')
+        action: Action name ('create', 'read', 'read_all', 'update', 'delete')
+        
+    Returns:
+        Callable: Dependency function returning the user ID and the user
+        record (None if authorized from token claims)
+    """
+    async def permission_checker(
+        payload: dict = Depends(get_token_payload),
+        db: AsyncSession = Depends(get_db)
+    ) -> tuple[int, User | None]:
+        user_id = int(payload["sub"])
+
+        # Check permission from token claims, falling back to the database
+        if check_token_permission(payload, resource, action):
+            return user_id, None
+
+        user = await get_current_user_record(user_id, db)
+        await check_permission(user, resource, action, db)
+        return user_id, user
+
+    return permission_checker
+
+
+def authorize(resource: str, action: str):
+    """
+    Create a dependency checking a permission without loading the user.
+    
+    Args:
+        resource: Resource name ('users', 'permissions', 'business_elements')
+        action: Action name ('create', 'read', 'read_all', 'update', 'delete')
+        
+    Returns:
+        Callable: Dependency function that checks permission and returns the user ID
+        
+    Notes:
+        - Up-to-date token claims are checked without any database access;
+          the user is loaded only when the token has no claims or they are stale
+        - Use require_permission for endpoints that need the user record
+        
+    Example:
+        @app.get("/items")
+        async def get_items(current_user_id: int = Depends(authorize("business_elements", "read_all"))):
+            ...
+    """
+    async def permission_checker(
+        checked: tuple[int, User | None] = Depends(_permission_check(resource, action))
+    ) -> int:
+        return checked[0]
+
+    return permission_checker
+
+
 def require_permission(resource: str, action: str):
     """
     Create a dependency for checking permissions on endpoints.
@@ -269,21 +708,21 @@ def require_permission(resource: str, action: str):
     Returns:
         Callable: Dependency function that checks permission and returns user
         
+    Notes:
+        - Always loads the user record (once, reusing the one loaded by the
+          permission check); endpoints that only need the user ID should
+          use authorize
+        
     Example:
         @app.get("/users")
         async def get_users(current_user: User = Depends(require_permission("users", "read_all"))):
             ...
     """
     async def permission_checker(
-        user_id: int = Depends(get_current_user),
+        checked: tuple[int, User | None] = Depends(_permission_check(resource, action)),
         db: AsyncSession = Depends(get_db)
-    ):
-        # Check permission
-        await check_permission(user_id, resource, action, db)
-        
-        # Get and return user for further use in endpoint
-        user_result = await db.execute(select(User).filter(User.id == user_id))
-        user = user_result.scalar_one_or_none()
-        return user
+    ) -> User:
+        user_id, user = checked
+        return user or await get_current_user_record(user_id, db)
 
     return permission_checker
@@ -1,32 +1,230 @@
 """
 Password Hashing Utilities.
 
-This module provides secure password hashing using bcrypt.
+This module provides secure password hashing through a registry of hashers:
+- bcrypt (default), with a per-hash salt and configurable cost
+- argon2id, with tunable time/memory cost (optional argon2-cffi dependency)
+
+Stored hashes are self-describing, so hashes of any registered scheme can be
+verified; verify_and_update_password reports when a hash should be upgraded
+to the configured scheme and cost.
+
+Password hashing is CPU-bound and takes hundreds of milliseconds per call, so async
+handlers must use the *_async variants, which run the work on a dedicated
+bounded executor instead of the event loop. Two backends are available
+(HASH_BACKEND setting):
+- thread: thread pool in the worker process (bcrypt releases the GIL)
+- process: process pool spreading hashing across all CPU cores
 """
 
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
 import bcrypt
 
-# Salt rounds: higher values are more secure but slower
-# 12 rounds is a good balance for most applications
-SALT_ROUNDS = 12
-salt = bcrypt.gensalt(rounds=SALT_ROUNDS)
+from config import settings
+
+T = TypeVar("T")
+
+try:
+    import argon2
+except ImportError:  # argon2id support is optional
+    argon2 = None
+
+# Dedicated executor for hashing, created on startup (or lazily on first use)
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+
+# Executor metrics (guarded by _stats_lock)
+_stats_lock = threading.Lock()
+_stats = {
+    "pending": 0,          # Jobs submitted but not yet finished
+    "shed": 0,             # Jobs rejected by admission control
+    "completed": 0,        # Jobs finished (successfully or not)
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+}
+
+
+class HashingOverloadedError(Exception):
+    """
+    Raised when a hashing job is rejected because too many jobs are pending.
+    
+    Attributes:
+        pending: Number of pending jobs at the time of rejection
+    """
+
+    def __init__(self, pending: int):
+        super().__init__(f"Password hashing queue is full ({pending} pending jobs)")
+        self.pending = pending
+
+
+class BcryptHasher:
+    """
+    Bcrypt password hasher.
+    
+    Attributes:
+        name: Scheme name used in the PASSWORD_HASH_SCHEME setting
+        rounds: Cost factor (log2 of iterations) for new hashes
+    """
+
+    name = "bcrypt"
+
+    def __init__(self, rounds: int):
+        self.rounds = rounds
+
+    def identify(self, hashed_password: str) -> bool:
+        """Check whether a stored hash was produced by bcrypt."""
+        return hashed_password.startswith(("$2a$", "$2b$", "$2y$"))
+
+    def hash(self, password: str) -> str:
+        """Hash a password with a fresh per-hash salt."""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password in constant time (salt is read from the hash)."""
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Check whether a hash was produced with a different cost factor."""
+        # Format: $2b$<rounds>$<salt+hash>
+        return int(hashed_password.split("$")[2]) != self.rounds
+
+
+class Argon2idHasher:
+    """
+    Argon2id password hasher (requires the argon2-cffi package).
+    
+    Attributes:
+        name: Scheme name used in the PASSWORD_HASH_SCHEME setting
+    """
+
+    name = "argon2id"
+
+    def __init__(self, time_cost: int, memory_cost: int, parallelism: int):
+        if argon2 is None:
+            raise RuntimeError("argon2id password hashing requires the 'argon2-cffi' package")
+        self._hasher = argon2.PasswordHasher(
+            time_cost=time_cost,
+            memory_cost=memory_cost,
+            parallelism=parallelism,
+            type=argon2.Type.ID
+        )
+
+    def identify(self, hashed_password: str) -> bool:
+        """Check whether a stored hash was produced by argon2id."""
+        return hashed_password.startswith("$argon2id$")
+
+    def hash(self, password: str) -> str:
+        """Hash a password with a fresh per-hash salt."""
+        return self._hasher.hash(password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password (parameters are read from the hash)."""
+        try:
+            return self._hasher.verify(hashed_password, password)
+        except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+            return False
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Check whether a hash was produced with different cost parameters."""
+        return self._hasher.check_needs_rehash(hashed_password)
+
+
+# Hasher factories by scheme name; instances are built lazily from settings
+# so that argon2 is only required when actually configured or encountered
+_HASHER_FACTORIES: dict[str, Callable[[], "BcryptHasher | Argon2idHasher"]] = {
+    "bcrypt": lambda: BcryptHasher(rounds=settings.BCRYPT_ROUNDS),
+    "argon2id": lambda: Argon2idHasher(
+        time_cost=settings.ARGON2_TIME_COST,
+        memory_cost=settings.ARGON2_MEMORY_COST,
+        parallelism=settings.ARGON2_PARALLELISM
+    ),
+}
+_hashers: dict = {}
+
+
+def register_hasher(name: str, factory: Callable) -> None:
+    """
+    Register an additional password hashing scheme.
+    
+    Args:
+        name: Scheme name (selectable via PASSWORD_HASH_SCHEME)
+        factory: Callable returning a hasher with identify/hash/verify/needs_rehash
+    """
+    _HASHER_FACTORIES[name] = factory
+    _hashers.pop(name, None)
+
+
+def get_hasher(name: str | None = None):
+    """
+    Get a password hasher by scheme name.
+    
+    Args:
+        name: Scheme name (default: PASSWORD_HASH_SCHEME setting)
+        
+    Returns:
+        Hasher instance for the scheme
+        
+    Raises:
+        ValueError: If the scheme is not registered
+    """
+    name = name or settings.PASSWORD_HASH_SCHEME
+    if name not in _hashers:
+        if name not in _HASHER_FACTORIES:
+            raise ValueError(f"Unknown password hash scheme '{name}'")
+        _hashers[name] = _HASHER_FACTORIES[name]()
+    return _hashers[name]
+
+
+def _identify_hasher(hashed_password: str):
+    """
+    Find the hasher that produced a stored hash.
+    
+    Args:
+        hashed_password: Stored password hash
+        
+    Returns:
+        Hasher instance, or None if the format is not recognized
+        
+    Notes:
+        - Schemes whose optional dependency is missing are skipped, so a hash
+          in an unknown format fails verification instead of raising
+    """
+    default = get_hasher()
+    if default.identify(hashed_password):
+        return default
+    for name in _HASHER_FACTORIES:
+        try:
+            hasher = get_hasher(name)
+        except RuntimeError:
+            continue
+        if hasher.identify(hashed_password):
+            return hasher
+    return None
 
 
 def get_password_hash(password: str) -> str:
     """
-    Hash a password using bcrypt.
+    Hash a password using the configured scheme.
     
     Args:
         password: Plain text password to hash
         
     Returns:
-        str: Bcrypt-hashed password
+        str: Hashed password
         
     Notes:
-        - Uses randomly generated salt
-        - Salt is embedded in the hash output
+        - Uses a randomly generated salt per hash
+        - Salt and cost parameters are embedded in the hash output
     """
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    return get_hasher().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -35,7 +233,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     
     Args:
         plain_password: Plain text password to verify
-        hashed_password: Bcrypt-hashed password to check against
+        hashed_password: Stored hash (any registered scheme)
         
     Returns:
         bool: True if password matches, False otherwise
@@ -44,4 +242,271 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         - Uses constant-time comparison to prevent timing attacks
         - Extracts salt from stored hash automatically
     """
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    hasher = _identify_hasher(hashed_password)
+    if hasher is None:
+        return False
+    return hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verify a password and rehash it if the stored hash is outdated.
+    
+    Args:
+        plain_password: Plain text password to verify
+        hashed_password: Stored hash (any registered scheme)
+        
+    Returns:
+        tuple[bool, str | None]: Whether the password matches, and a new hash
+        to store if the stored one uses another scheme or other cost settings
+        
+    Notes:
+        - The new hash is only computed for a correct password
+    """
+    hasher = _identify_hasher(hashed_password)
+    if hasher is None or not hasher.verify(plain_password, hashed_password):
+        return False, None
+
+    default = get_hasher()
+    if hasher is not default or default.needs_rehash(hashed_password):
+        return True, default.hash(plain_password)
+    return True, None
+
+
+def _get_pool_size() -> int:
+    """
+    Get the number of hashing workers for the configured backend.
+    
+    Returns:
+        int: Worker count (process backend defaults to all CPU cores)
+    """
+    if settings.HASH_BACKEND == "process":
+        return settings.HASH_PROCESS_POOL_SIZE or os.cpu_count() or 1
+    return settings.HASH_THREAD_POOL_SIZE
+
+
+def _create_executor() -> Executor:
+    """
+    Create the password hashing executor for the configured backend.
+    
+    Returns:
+        Executor: Thread pool ("thread") or process pool ("process")
+        
+    Raises:
+        ValueError: If HASH_BACKEND is not a known backend
+        
+    Notes:
+        - Process workers use the forkserver start method, so they are not
+          forked from a process with a running event loop and threads
+    """
+    if settings.HASH_BACKEND == "process":
+        return ProcessPoolExecutor(
+            max_workers=_get_pool_size(),
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    if settings.HASH_BACKEND == "thread":
+        return ThreadPoolExecutor(
+            max_workers=_get_pool_size(),
+            thread_name_prefix="password-hash"
+        )
+    raise ValueError(f"Unknown HASH_BACKEND '{settings.HASH_BACKEND}'")
+
+
+def _get_executor() -> Executor:
+    """
+    Get (or lazily create) the password hashing executor.
+    
+    Returns:
+        Executor: Executor for the configured HASH_BACKEND
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = _create_executor()
+    return _executor
+
+
+def _timed_call(func: Callable[..., T], *args) -> tuple[float, T]:
+    """
+    Call func and report when the worker started executing it.
+    
+    Runs inside the executor (thread or child process). time.monotonic()
+    is system-wide, so the start time is comparable across processes.
+    
+    Args:
+        func: Blocking function to execute
+        *args: Positional arguments for func
+        
+    Returns:
+        tuple[float, T]: Monotonic start time and result of func
+    """
+    return time.monotonic(), func(*args)
+
+
+def _warmup() -> int:
+    """
+    No-op job used to pre-start executor workers.
+    
+    Returns:
+        int: PID of the worker that ran the job
+    """
+    get_hasher()
+    return os.getpid()
+
+
+async def _run_in_hash_pool(func: Callable[..., T], *args, max_pending: int | None = None) -> T:
+    """
+    Run a hashing function on the dedicated executor and record metrics.
+    
+    Args:
+        func: Blocking, module-level (picklable) function to execute
+        *args: Positional arguments for func
+        max_pending: Reject the job if this many jobs are already pending
+        
+    Returns:
+        T: Result of func
+        
+    Raises:
+        HashingOverloadedError: If max_pending is reached
+    """
+    submitted_at = time.monotonic()
+    with _stats_lock:
+        if max_pending is not None and _stats["pending"] >= max_pending:
+            _stats["shed"] += 1
+            raise HashingOverloadedError(_stats["pending"])
+        _stats["pending"] += 1
+
+    started_at = submitted_at
+    try:
+        loop = asyncio.get_running_loop()
+        started_at, result = await loop.run_in_executor(_get_executor(), _timed_call, func, *args)
+        return result
+    finally:
+        wait = max(started_at - submitted_at, 0.0)
+        with _stats_lock:
+            _stats["pending"] -= 1
+            _stats["completed"] += 1
+            _stats["wait_seconds_total"] += wait
+            _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], wait)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a password without blocking the event loop.
+    
+    Args:
+        password: Plain text password to hash
+        
+    Returns:
+        str: Hashed password
+    """
+    return await _run_in_hash_pool(get_password_hash, password)
+
+
+async def verify_password_async(
+    plain_password: str,
+    hashed_password: str,
+    max_pending: int | None = None
+) -> bool:
+    """
+    Verify a password against its hash without blocking the event loop.
+    
+    Args:
+        plain_password: Plain text password to verify
+        hashed_password: Stored hash (any registered scheme)
+        max_pending: Admission limit; reject instead of queueing when this
+                     many hashing jobs are already pending
+                     
+    Returns:
+        bool: True if password matches, False otherwise
+        
+    Raises:
+        HashingOverloadedError: If max_pending is reached
+    """
+    return await _run_in_hash_pool(
+        verify_password, plain_password, hashed_password, max_pending=max_pending
+    )
+
+
+async def verify_and_update_password_async(
+    plain_password: str,
+    hashed_password: str,
+    max_pending: int | None = None
+) -> tuple[bool, str | None]:
+    """
+    Verify a password and compute an upgraded hash without blocking the event loop.
+    
+    Args:
+        plain_password: Plain text password to verify
+        hashed_password: Stored hash (any registered scheme)
+        max_pending: Admission limit; reject instead of queueing when this
+                     many hashing jobs are already pending
+                     
+    Returns:
+        tuple[bool, str | None]: Whether the password matches, and a new hash
+        to store if the stored one is outdated
+        
+    Raises:
+        HashingOverloadedError: If max_pending is reached
+    """
+    return await _run_in_hash_pool(
+        verify_and_update_password, plain_password, hashed_password, max_pending=max_pending
+    )
+
+
+def get_hash_executor_stats() -> dict:
+    """
+    Get password hashing executor metrics.
+    
+    Returns:
+        dict: Backend, pool size, queue depth, shed jobs and wait-time statistics
+        
+    Notes:
+        - queue_depth is estimated as pending jobs beyond the pool size
+        - A persistently non-zero queue_depth means the pool is undersized
+        - Wait time is measured from submission until a worker picks the job up
+    """
+    pool_size = _get_pool_size()
+    with _stats_lock:
+        pending = _stats["pending"]
+        completed = _stats["completed"]
+        return {
+            "backend": settings.HASH_BACKEND,
+            "pool_size": pool_size,
+            "pending": pending,
+            "queue_depth": max(pending - pool_size, 0),
+            "completed": completed,
+            "shed": _stats["shed"],
+            "wait_seconds_avg": _stats["wait_seconds_total"] / completed if completed else 0.0,
+            "wait_seconds_max": _stats["wait_seconds_max"],
+        }
+
+
+async def start_hash_executor() -> None:
+    """
+    Create the password hashing executor and pre-start its workers.
+    
+    Called during application startup via lifespan context manager, so the
+    first logins after a deploy do not pay for worker process start-up.
+    """
+    executor = _get_executor()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(executor, _warmup)
+        for _ in range(_get_pool_size())
+    ))
+
+
+async def shutdown_hash_executor() -> None:
+    """
+    Shut down the password hashing executor.
+    
+    Called during application shutdown via lifespan context manager.
+    Waits for in-flight hashing jobs to finish.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        await asyncio.to_thread(executor.shutdown, wait=True)
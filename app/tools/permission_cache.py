@@ -0,0 +1,346 @@
+"""
+In-Memory Permission Matrix.
+
+This module provides a process-local cache of role permissions:
+- Each role is compiled to a bitmask of the 15 Permissions flags
+- The matrix is loaded at startup and updated on permission writes
+- Authorization for a cached role is a dictionary lookup and a bit test
+
+Roles missing from the matrix are loaded from the database on first use.
+
+Workers are kept consistent through PostgreSQL LISTEN/NOTIFY: endpoints that
+change roles publish a notification on PERMISSIONS_CHANNEL inside their
+transaction, and a listener task in every worker invalidates the affected
+entries as soon as it is committed. A periodic full resync covers missed
+notifications (e.g. while the listener was reconnecting).
+
+Every published change also increments the global permissions version
+(permissions_version table). Access tokens with embedded permission claims
+record the version they were issued at and are only trusted while it is
+still current.
+"""
+
+import asyncio
+import random
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from database.models_db import Permissions, PermissionsVersion
+from database.database import AsyncSessionLocal
+
+RESOURCES = ("users", "permissions", "business_elements")
+ACTIONS = ("create", "read", "read_all", "update", "delete")
+
+# Permission flag names in bit order: {action}_{resource}
+PERMISSION_FLAGS = tuple(f"{action}_{resource}" for resource in RESOURCES for action in ACTIONS)
+PERMISSION_BITS = {flag: 1 << index for index, flag in enumerate(PERMISSION_FLAGS)}
+
+# Compiled matrix: role name -> permission bitmask
+_role_masks: dict[str, int] = {}
+
+# Last known global permissions version (None until loaded)
+_permissions_version: int | None = None
+
+# Roles named by notifications received while the matrix is being reloaded,
+# dropped from the new matrix before it replaces the current one
+_reload_pending: list[str] | None = None
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "notifications": 0,
+    "resyncs": 0,
+}
+
+# NOTIFY channel for role/permission changes. Payloads:
+# - "<version>:role:<role_name>": permissions of a role changed
+# - "<version>:user:<user_id>": role of a user changed (no cached entry to
+#   drop; the version bump makes embedded token claims stale)
+PERMISSIONS_CHANNEL = "permissions_changed"
+
+# Background listener task
+_sync_task: asyncio.Task | None = None
+
+
+def permissions_to_mask(permission: Permissions) -> int:
+    """
+    Compile a Permissions record into a bitmask.
+    
+    Args:
+        permission: Permissions record for a role
+        
+    Returns:
+        int: Bitmask with one bit per granted flag
+    """
+    mask = 0
+    for flag, bit in PERMISSION_BITS.items():
+        if getattr(permission, flag):
+            mask |= bit
+    return mask
+
+
+def get_permission_bit(resource: str, action: str) -> int | None:
+    """
+    Get the bit for a resource/action pair.
+    
+    Args:
+        resource: Resource name ('users', 'permissions', 'business_elements')
+        action: Action name ('create', 'read', 'read_all', 'update', 'delete')
+        
+    Returns:
+        int | None: Bit value, or None if the pair is not a known permission
+    """
+    return PERMISSION_BITS.get(f"{action}_{resource}")
+
+
+def set_role_permissions(permission: Permissions) -> None:
+    """
+    Store (or replace) the compiled permissions of a role.
+    
+    Args:
+        permission: Permissions record for the role
+    """
+    _role_masks[permission.role_name] = permissions_to_mask(permission)
+
+
+def remove_role_permissions(role_name: str) -> None:
+    """
+    Remove a role from the matrix.
+    
+    Args:
+        role_name: Name of the role to remove
+    """
+    _role_masks.pop(role_name, None)
+
+
+async def load_permission_matrix(db: AsyncSession) -> None:
+    """
+    Load permissions of all roles and the permissions version, replacing the current matrix.
+    
+    Args:
+        db: Database session
+        
+    Notes:
+        - The version is read first, so the matrix is never older than it
+        - Roles changed while the matrix is being read may be stale in the
+          snapshot; notifications received meanwhile are buffered and their
+          roles dropped from the new matrix (reloaded on next use)
+    """
+    global _role_masks, _permissions_version, _reload_pending
+    _reload_pending = []
+    try:
+        version = await db.scalar(select(PermissionsVersion.version).filter(PermissionsVersion.id == 1))
+        _permissions_version = max(version or 0, _permissions_version or 0)
+
+        result = await db.execute(select(Permissions))
+        role_masks = {
+            permission.role_name: permissions_to_mask(permission)
+            for permission in result.scalars().all()
+        }
+        for role_name in _reload_pending:
+            role_masks.pop(role_name, None)
+        _role_masks = role_masks
+    finally:
+        _reload_pending = None
+
+
+async def init_permission_cache() -> None:
+    """
+    Load the permission matrix from the database.
+    
+    Called during application startup via lifespan context manager.
+    """
+    async with AsyncSessionLocal() as session:
+        await load_permission_matrix(session)
+
+
+async def get_role_mask(role_name: str, db: AsyncSession) -> int | None:
+    """
+    Get the permission bitmask of a role.
+    
+    Args:
+        role_name: Name of the role
+        db: Database session (used only on cache miss)
+        
+    Returns:
+        int | None: Permission bitmask, or None if the role has no permissions record
+        
+    Notes:
+        - Missing roles are not cached, so newly created roles are picked up
+        - A loaded mask is not cached if the version moved while it was
+          read, since a notification for the role may have been missed
+    """
+    mask = _role_masks.get(role_name)
+    if mask is not None:
+        _stats["hits"] += 1
+        return mask
+
+    _stats["misses"] += 1
+    version = _permissions_version
+    result = await db.execute(select(Permissions).filter(Permissions.role_name == role_name))
+    permission = result.scalar_one_or_none()
+    if not permission:
+        return None
+
+    if _permissions_version == version:
+        set_role_permissions(permission)
+    return permissions_to_mask(permission)
+
+
+def get_permissions_version() -> int | None:
+    """
+    Get the last known global permissions version.
+    
+    Returns:
+        int | None: Permissions version, or None if not loaded yet
+    """
+    return _permissions_version
+
+
+async def publish_permission_change(db: AsyncSession, change: str) -> None:
+    """
+    Bump the permissions version and notify all workers of a change.
+    
+    Args:
+        db: Database session of the changing request
+        change: "role:<role_name>" or "user:<user_id>"
+        
+    Notes:
+        - The version row is created on first use
+        - NOTIFY is transactional: it is delivered only when db commits
+    """
+    await publish_permission_changes(db, [change])
+
+
+async def publish_permission_changes(db: AsyncSession, changes: list[str]) -> None:
+    """
+    Bump the permissions version once and notify all workers of several changes.
+    
+    Args:
+        db: Database session of the changing request
+        changes: "role:<role_name>" or "user:<user_id>" entries
+        
+    Notes:
+        - All notifications are sent by one statement
+    """
+    if not changes:
+        return
+    version = await db.scalar(text(
+        "INSERT INTO permissions_version (id, version) VALUES (1, 1) "
+        "ON CONFLICT (id) DO UPDATE SET version = permissions_version.version + 1 "
+        "RETURNING version"
+    ))
+    await db.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": PERMISSIONS_CHANNEL, "payloads": [f"{version}:{change}" for change in changes]}
+    )
+
+
+def _handle_notification(connection, pid: int, channel: str, payload: str) -> None:
+    """
+    Invalidate cached entries named by a notification (asyncpg listener).
+    """
+    global _permissions_version
+    _stats["notifications"] += 1
+    try:
+        version, kind, key = payload.split(":", 2)
+    except ValueError:
+        return
+
+    # Drop the entry before advertising the new version
+    if kind == "role":
+        remove_role_permissions(key)
+        if _reload_pending is not None:
+            _reload_pending.append(key)
+    _permissions_version = max(int(version), _permissions_version or 0)
+
+
+async def _resync() -> None:
+    """
+    Reload the whole permission matrix from the database.
+    """
+    await init_permission_cache()
+    _stats["resyncs"] += 1
+
+
+async def _listen_for_changes() -> None:
+    """
+    Listen for permission change notifications until cancelled.
+    
+    Reconnects on connection loss and performs a full resync after every
+    (re)connect and every PERMISSION_RESYNC_SECONDS (with jitter, so workers
+    do not resync at the same moment).
+    """
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(settings.asyncpg_dsn)
+            connection_lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: connection_lost.set())
+            await connection.add_listener(PERMISSIONS_CHANNEL, _handle_notification)
+
+            # Notifications may have been missed while disconnected
+            await _resync()
+
+            while not connection_lost.is_set():
+                interval = settings.PERMISSION_RESYNC_SECONDS * random.uniform(0.8, 1.2)
+                try:
+                    await asyncio.wait_for(connection_lost.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    await _resync()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Permission listener error: {e!r}")
+            await asyncio.sleep(5)
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+
+
+def start_permission_sync() -> None:
+    """
+    Start the permission change listener task.
+    
+    Called during application startup via lifespan context manager.
+    """
+    global _sync_task
+    if _sync_task is None:
+        _sync_task = asyncio.create_task(_listen_for_changes())
+
+
+async def stop_permission_sync() -> None:
+    """
+    Stop the permission change listener task.
+    
+    Called during application shutdown via lifespan context manager.
+    """
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
+
+
+def get_permission_cache_stats() -> dict:
+    """
+    Get permission matrix metrics.
+    
+    Returns:
+        dict: Number of cached roles, version, hits, misses, notifications and resyncs
+    """
+    return {
+        "roles": len(_role_masks),
+        "version": _permissions_version,
+        "hits": _stats["hits"],
+        "misses": _stats["misses"],
+        "notifications": _stats["notifications"],
+        "resyncs": _stats["resyncs"],
+    }
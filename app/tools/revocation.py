@@ -0,0 +1,404 @@
+"""
+Access Token Revocation.
+
+Access tokens are self-contained, so deactivating a user or logging out does
+not invalidate them by itself. This module keeps a revocation list:
+- Entries are stored in the revoked_access table, keyed "jti:<token id>"
+  (one token) or "user:<user_id>" (every token of the user issued up to the
+  revocation time), and deleted once the tokens they cover have expired
+- Issue and revocation times are compared in microseconds ('iat_us' claim),
+  since 'iat' has whole-second precision and a token issued right after a
+  revocation usually has the same 'iat' second
+- Every worker keeps a Bloom filter of all entry keys. A token whose keys
+  are not in the filter is certainly not revoked, which is the common case
+  and needs no database access; only filter hits are checked in the database
+
+The filter is kept current through PostgreSQL LISTEN/NOTIFY (new entries are
+published on REVOCATION_CHANNEL when their transaction commits) and rebuilt
+from the table every ACCESS_REVOCATION_RESYNC_SECONDS, which drops expired
+entries and covers missed notifications. Before a rebuild, one worker at a
+time (transaction-level advisory lock) deletes the expired entries.
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+from datetime import datetime, timedelta
+import datetime as D
+
+import asyncpg
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from database.database import AsyncSessionLocal
+from database.models_db import RevokedAccess
+
+# NOTIFY channel for new revocation entries (payload: entry key)
+REVOCATION_CHANNEL = "access_revoked"
+
+# Advisory lock key serializing expired entry cleanup across workers
+_CLEANUP_LOCK_ID = 0x52564B41  # "RVKA"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=D.timezone.utc)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string keys.
+    
+    Args:
+        capacity: Expected number of keys
+        error_rate: False positive probability at capacity
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        """
+        Get the bit positions of a key (double hashing).
+        """
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str) -> None:
+        """
+        Add a key to the filter.
+        """
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+# Per-worker filter of revocation entry keys (None until loaded)
+_filter: BloomFilter | None = None
+
+# Keys received while a rebuild is in progress, added to the new filter
+_rebuild_pending: list[str] | None = None
+
+_stats = {
+    "negatives": 0,
+    "filter_hits": 0,
+    "revoked": 0,
+    "notifications": 0,
+    "rebuilds": 0,
+    "expired_deleted": 0,
+}
+
+# Background listener task
+_sync_task: asyncio.Task | None = None
+
+
+def to_microseconds(moment: datetime) -> int:
+    """
+    Convert an aware datetime to integer microseconds since the Unix epoch.
+    
+    Args:
+        moment: Timezone-aware datetime
+        
+    Returns:
+        int: Microseconds since 1970-01-01 UTC (exact, no float rounding)
+    """
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _add_key(key: str) -> None:
+    """
+    Add an entry key to the current filter (and to a filter being rebuilt).
+    """
+    if _filter is not None:
+        _filter.add(key)
+    if _rebuild_pending is not None:
+        _rebuild_pending.append(key)
+
+
+async def revoke_access(db: AsyncSession, key: str, expires_at: datetime) -> None:
+    """
+    Store a revocation entry and notify all workers.
+    
+    Args:
+        db: Database session of the revoking request (the caller commits)
+        key: "jti:<token id>" or "user:<user_id>"
+        expires_at: Time after which the entry is no longer needed
+        
+    Notes:
+        - Re-revoking a key moves its revocation time forward
+        - NOTIFY is transactional: it is delivered only when db commits
+    """
+    now = datetime.now(D.timezone.utc)
+    statement = insert(RevokedAccess).values(key=key, revoked_at=now, expires_at=expires_at)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[RevokedAccess.key],
+        set_={
+            "revoked_at": statement.excluded.revoked_at,
+            "expires_at": statement.excluded.expires_at,
+        }
+    ))
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": REVOCATION_CHANNEL, "payload": key}
+    )
+
+
+async def revoke_users_access(user_ids: list[int], db: AsyncSession) -> None:
+    """
+    Revoke all access tokens issued so far to several users.
+    
+    Args:
+        user_ids: IDs of the users
+        db: Database session (the caller commits)
+        
+    Notes:
+        - One upsert and one NOTIFY statement for all users, each taking
+          the keys as a single array parameter
+    """
+    if not user_ids:
+        return
+    keys = [f"user:{user_id}" for user_id in user_ids]
+    now = datetime.now(D.timezone.utc)
+    expires_at = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    await db.execute(
+        text(
+            "INSERT INTO revoked_access (key, revoked_at, expires_at) "
+            "SELECT key, :revoked_at, :expires_at FROM unnest(CAST(:keys AS varchar[])) AS key "
+            "ON CONFLICT (key) DO UPDATE SET revoked_at = excluded.revoked_at, expires_at = excluded.expires_at"
+        ),
+        {"keys": keys, "revoked_at": now, "expires_at": expires_at}
+    )
+    await db.execute(
+        text("SELECT pg_notify(:channel, key) FROM unnest(CAST(:keys AS varchar[])) AS key"),
+        {"channel": REVOCATION_CHANNEL, "keys": keys}
+    )
+
+
+async def revoke_access_token(payload: dict, db: AsyncSession) -> None:
+    """
+    Revoke a single access token.
+    
+    Args:
+        payload: Verified access token payload
+        db: Database session (the caller commits)
+        
+    Notes:
+        - Tokens without a 'jti' claim cannot be revoked individually
+    """
+    jti = payload.get("jti")
+    if jti:
+        await revoke_access(db, f"jti:{jti}", datetime.fromtimestamp(payload["exp"], D.timezone.utc))
+
+
+async def revoke_user_access(user_id: int, db: AsyncSession) -> None:
+    """
+    Revoke all access tokens issued to a user so far.
+    
+    Args:
+        user_id: ID of the user
+        db: Database session (the caller commits)
+        
+    Notes:
+        - Tokens issued after the revocation (e.g. after reactivation) stay valid
+    """
+    expires_at = datetime.now(D.timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    await revoke_access(db, f"user:{user_id}", expires_at)
+
+
+async def is_access_token_revoked(payload: dict, db: AsyncSession) -> bool:
+    """
+    Check whether an access token has been revoked.
+    
+    Args:
+        payload: Verified access token payload
+        db: Database session (used only on a filter hit)
+        
+    Returns:
+        bool: True if the token or all tokens of its user up to its
+        issue time have been revoked
+    """
+    keys = [f"user:{payload['sub']}"]
+    if payload.get("jti"):
+        keys.append(f"jti:{payload['jti']}")
+
+    if _filter is not None:
+        keys = [key for key in keys if key in _filter]
+        if not keys:
+            _stats["negatives"] += 1
+            return False
+    _stats["filter_hits"] += 1
+
+    now = datetime.now(D.timezone.utc)
+    result = await db.execute(
+        select(RevokedAccess.key, RevokedAccess.revoked_at)
+        .filter(RevokedAccess.key.in_(keys), RevokedAccess.expires_at > now)
+    )
+    # Tokens without 'iat_us' (issued before it was added) fall back to the
+    # whole-second 'iat' and count as revoked within the revocation second
+    issued_at = payload.get("iat_us", payload.get("iat", 0) * 1_000_000)
+    for key, revoked_at in result.all():
+        if key.startswith("jti:") or issued_at <= to_microseconds(revoked_at):
+            _stats["revoked"] += 1
+            return True
+    return False
+
+
+async def delete_expired_revocations(db: AsyncSession) -> int:
+    """
+    Delete revocation entries that are no longer needed.
+    
+    Args:
+        db: Database session (the caller commits)
+        
+    Returns:
+        int: Number of deleted entries
+    """
+    now = datetime.now(D.timezone.utc)
+    result = await db.execute(
+        delete(RevokedAccess)
+        .where(RevokedAccess.expires_at <= now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+async def load_revocation_filter() -> None:
+    """
+    Delete expired revocation entries and rebuild the Bloom filter from the rest.
+    
+    Called during application startup via lifespan context manager and
+    periodically by the listener task.
+    
+    Notes:
+        - Sized for ACCESS_REVOCATION_BLOOM_CAPACITY keys, or twice the
+          current number of entries if that is larger
+        - Expired entries are deleted only by the worker that gets the
+          advisory lock; the others skip the cleanup
+    """
+    global _filter, _rebuild_pending
+    _rebuild_pending = []
+    try:
+        now = datetime.now(D.timezone.utc)
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                locked = await session.scalar(
+                    text("SELECT pg_try_advisory_xact_lock(:lock_id)"),
+                    {"lock_id": _CLEANUP_LOCK_ID}
+                )
+                if locked:
+                    _stats["expired_deleted"] += await delete_expired_revocations(session)
+                result = await session.execute(select(RevokedAccess.key).filter(RevokedAccess.expires_at > now))
+                keys = result.scalars().all()
+
+        bloom = BloomFilter(
+            max(settings.ACCESS_REVOCATION_BLOOM_CAPACITY, 2 * len(keys)),
+            settings.ACCESS_REVOCATION_BLOOM_ERROR_RATE
+        )
+        for key in keys:
+            bloom.add(key)
+        for key in _rebuild_pending:
+            bloom.add(key)
+        _filter = bloom
+    finally:
+        _rebuild_pending = None
+    _stats["rebuilds"] += 1
+
+
+def _handle_notification(connection, pid: int, channel: str, payload: str) -> None:
+    """
+    Add a newly revoked key to the filter (asyncpg listener).
+    """
+    _stats["notifications"] += 1
+    _add_key(payload)
+
+
+async def _listen_for_revocations() -> None:
+    """
+    Listen for revocation notifications until cancelled.
+    
+    Reconnects on connection loss and rebuilds the filter after every
+    (re)connect and every ACCESS_REVOCATION_RESYNC_SECONDS (with jitter).
+    """
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(settings.asyncpg_dsn)
+            connection_lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: connection_lost.set())
+            await connection.add_listener(REVOCATION_CHANNEL, _handle_notification)
+
+            # Notifications may have been missed while disconnected
+            await load_revocation_filter()
+
+            while not connection_lost.is_set():
+                interval = settings.ACCESS_REVOCATION_RESYNC_SECONDS * random.uniform(0.8, 1.2)
+                try:
+                    await asyncio.wait_for(connection_lost.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    await load_revocation_filter()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Revocation listener error: {e!r}")
+            await asyncio.sleep(5)
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+
+
+def start_revocation_sync() -> None:
+    """
+    Start the revocation listener task.
+    
+    Called during application startup via lifespan context manager.
+    """
+    global _sync_task
+    if _sync_task is None:
+        _sync_task = asyncio.create_task(_listen_for_revocations())
+
+
+async def stop_revocation_sync() -> None:
+    """
+    Stop the revocation listener task.
+    
+    Called during application shutdown via lifespan context manager.
+    """
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
+
+
+def get_revocation_stats() -> dict:
+    """
+    Get access token revocation metrics.
+    
+    Returns:
+        dict: Filter size, number of keys, checks answered by the filter
+        alone (negatives), filter hits checked in the database, revoked
+        tokens found, notifications, rebuilds and deleted expired entries
+    """
+    return {
+        "filter_bits": _filter.size if _filter is not None else 0,
+        "filter_keys": _filter.count if _filter is not None else 0,
+        "negatives": _stats["negatives"],
+        "filter_hits": _stats["filter_hits"],
+        "revoked": _stats["revoked"],
+        "notifications": _stats["notifications"],
+        "rebuilds": _stats["rebuilds"],
+        "expired_deleted": _stats["expired_deleted"],
+    }
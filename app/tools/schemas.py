@@ -3,13 +3,16 @@ Pydantic Schemas for Request/Response Validation.
 
 This module defines data schemas for:
 - User authentication (register, login, tokens)
+- Bulk user administration (selection by IDs or filter)
 - Permissions (create, read, update, delete)
 - Business elements (create, read, update, delete)
 """
 
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, model_validator
 from typing import List, Optional
 
+from config import settings
+
 
 # ============== Authentication Schemas ==============
 
@@ -79,6 +82,52 @@ class TokenLogoutRequest(BaseModel):
     refresh_token: str
 
 
+# ============== Admin Bulk Operation Schemas ==============
+
+class UserFilter(BaseModel):
+    """
+    Schema for selecting users by attributes.
+    
+    Attributes:
+        is_role: Only users with this role
+        is_active: Only active (True) or inactive (False) users
+        email_prefix: Only users whose email starts with this string
+    """
+    is_role: Optional[str] = Field(None, max_length=50)
+    is_active: Optional[bool] = None
+    email_prefix: Optional[str] = Field(None, min_length=1, max_length=100)
+
+
+class BulkUserSelection(BaseModel):
+    """
+    Schema for selecting the users of a bulk operation.
+    
+    Attributes:
+        ids: IDs of the users (up to ADMIN_BULK_MAX_USERS)
+        filter: Select users matching the filter instead (at least one field set)
+    """
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=settings.ADMIN_BULK_MAX_USERS)
+    filter: Optional[UserFilter] = None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Specify either ids or filter")
+        if self.filter is not None and not self.filter.model_dump(exclude_none=True):
+            raise ValueError("filter must set at least one field")
+        return self
+
+
+class BulkRoleUpdate(BulkUserSelection):
+    """
+    Schema for a bulk role change.
+    
+    Attributes:
+        new_role: Role name to assign
+    """
+    new_role: str = Field(..., min_length=1, max_length=50)
+
+
 # ============== Permissions Schemas ==============
 
 class PermissionCreate(BaseModel):
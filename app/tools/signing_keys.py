@@ -0,0 +1,301 @@
+"""
+JWT Signing Keys.
+
+This module signs and verifies JWT tokens:
+- HS256 (default): shared SECRET_KEY, tokens can only be verified here
+- ES256 / EdDSA: asymmetric keys with 'kid' headers, published as a JWKS
+  so other services can verify tokens locally
+  
+Asymmetric keys are stored in the signing_keys table (private keys encrypted
+with SECRET_KEY) so all workers share them. A background task reloads them
+and rotates the signing key every JWT_KEY_ROTATION_DAYS. A new key is
+published (JWKS, other workers) before it becomes active, and old keys stay
+available for verification until every token they signed has expired.
+"""
+
+import asyncio
+import datetime as D
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+from sqlalchemy import delete, text
+from sqlalchemy.future import select
+
+from config import settings
+from database.database import AsyncSessionLocal
+from database.models_db import SigningKey
+
+ASYMMETRIC_ALGORITHMS = ("ES256", "EdDSA")
+
+# Advisory lock key serializing key creation across workers
+_KEY_ROTATION_LOCK_ID = 0x4A574B53  # "JWKS"
+
+# Loaded keys: kid -> (private key, public key, activates_at, expires_at)
+_keys: dict[str, tuple] = {}
+_signing_kid: str | None = None
+
+# Background rotation task
+_rotation_task: asyncio.Task | None = None
+
+
+def is_asymmetric() -> bool:
+    """
+    Check whether tokens are signed with asymmetric keys.
+    
+    Returns:
+        bool: True for ES256/EdDSA, False for HMAC algorithms
+    """
+    return settings.ALGORITHM in ASYMMETRIC_ALGORITHMS
+
+
+def encode_token(payload: dict) -> str:
+    """
+    Sign a JWT payload with the configured algorithm.
+    
+    Args:
+        payload: Token claims
+        
+    Returns:
+        str: Encoded JWT token
+        
+    Raises:
+        RuntimeError: If asymmetric signing is configured but no key is active
+    """
+    if not is_asymmetric():
+        return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+    if _signing_kid is None:
+        raise RuntimeError("No active JWT signing key loaded")
+    private_key = _keys[_signing_kid][0]
+    return jwt.encode(payload, private_key, algorithm=settings.ALGORITHM, headers={"kid": _signing_kid})
+
+
+def decode_jwt(token: str) -> dict:
+    """
+    Verify and decode a JWT token.
+    
+    Args:
+        token: JWT token string
+        
+    Returns:
+        dict: Decoded payload
+        
+    Raises:
+        jwt.PyJWTError: If the token is invalid, expired, or signed by an unknown key
+    """
+    if not is_asymmetric():
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = _keys.get(kid)
+    if key is None:
+        raise jwt.InvalidKeyError(f"Unknown signing key '{kid}'")
+    return jwt.decode(token, key[1], algorithms=[settings.ALGORITHM])
+
+
+def get_jwks() -> dict:
+    """
+    Build the JSON Web Key Set of all published verification keys.
+    
+    Returns:
+        dict: JWKS document ({"keys": [...]}); empty for HMAC algorithms
+        
+    Notes:
+        - Includes keys that are not active yet, so consumers learn about
+          them before the first token signed with them appears
+    """
+    jwk_algorithm = ECAlgorithm if settings.ALGORITHM == "ES256" else OKPAlgorithm
+    keys = []
+    for kid, (_, public_key, _, _) in _keys.items():
+        jwk = json.loads(jwk_algorithm.to_jwk(public_key))
+        jwk.update({"kid": kid, "use": "sig", "alg": settings.ALGORITHM})
+        keys.append(jwk)
+    return {"keys": keys}
+
+
+def _generate_private_key():
+    """
+    Generate a private key for the configured algorithm.
+    
+    Returns:
+        EC P-256 private key (ES256) or Ed25519 private key (EdDSA)
+    """
+    if settings.ALGORITHM == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    return ed25519.Ed25519PrivateKey.generate()
+
+
+def _key_lifetime() -> timedelta:
+    """
+    Get how long a key must stay verifiable after activation.
+    
+    Returns:
+        timedelta: Signing period plus the longest token lifetime
+    """
+    return (
+        timedelta(days=settings.JWT_KEY_ROTATION_DAYS)
+        + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        + timedelta(seconds=_publish_delay())
+    )
+
+
+def _publish_delay() -> int:
+    """
+    Get how long a new key is published before it is used for signing.
+    
+    Returns:
+        int: Delay in seconds, long enough for every worker to reload keys
+        and for consumers' cached JWKS to expire
+    """
+    return max(2 * settings.JWT_KEY_RELOAD_SECONDS, settings.JWKS_MAX_AGE_SECONDS)
+
+
+async def _load_keys() -> None:
+    """
+    Load all unexpired signing keys from the database.
+    
+    Notes:
+        - The signing key is the newest key whose activation time has passed
+    """
+    global _keys, _signing_kid
+    now = datetime.now(D.timezone.utc)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(SigningKey)
+            .filter(SigningKey.algorithm == settings.ALGORITHM, SigningKey.expires_at > now)
+            .order_by(SigningKey.activates_at)
+        )
+        records = result.scalars().all()
+
+    keys = {}
+    signing_kid = None
+    for record in records:
+        private_key = serialization.load_pem_private_key(
+            record.private_key.encode("utf-8"),
+            password=settings.SECRET_KEY.encode("utf-8")
+        )
+        keys[record.kid] = (private_key, private_key.public_key(), record.activates_at, record.expires_at)
+        if record.activates_at <= now:
+            signing_kid = record.kid
+
+    _keys = keys
+    _signing_kid = signing_kid
+
+
+async def _rotate_keys() -> None:
+    """
+    Create a new signing key if needed and delete expired ones.
+    
+    Notes:
+        - Runs under a transaction-level advisory lock so only one worker
+          creates a key
+        - Without any usable key, the new key is active immediately
+          (first start); otherwise it activates after the publish delay
+    """
+    now = datetime.now(D.timezone.utc)
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            locked = await session.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id)"),
+                {"lock_id": _KEY_ROTATION_LOCK_ID}
+            )
+            if not locked:
+                return
+
+            await session.execute(delete(SigningKey).filter(SigningKey.expires_at <= now))
+
+            newest = await session.scalar(
+                select(SigningKey)
+                .filter(SigningKey.algorithm == settings.ALGORITHM)
+                .order_by(SigningKey.activates_at.desc())
+                .limit(1)
+            )
+            publish_at = now + timedelta(seconds=_publish_delay())
+            if newest is None:
+                activates_at = now
+            elif newest.activates_at + timedelta(days=settings.JWT_KEY_ROTATION_DAYS) <= publish_at:
+                activates_at = publish_at
+            else:
+                return
+
+            private_key = _generate_private_key()
+            session.add(SigningKey(
+                kid=uuid.uuid4().hex,
+                algorithm=settings.ALGORITHM,
+                private_key=private_key.private_bytes(
+                    encoding=serialization.Encoding.PEM,
+                    format=serialization.PrivateFormat.PKCS8,
+                    encryption_algorithm=serialization.BestAvailableEncryption(settings.SECRET_KEY.encode("utf-8"))
+                ).decode("utf-8"),
+                created_at=now,
+                activates_at=activates_at,
+                expires_at=activates_at + _key_lifetime()
+            ))
+
+
+async def _rotation_loop() -> None:
+    """
+    Periodically rotate and reload signing keys until cancelled.
+    """
+    while True:
+        await asyncio.sleep(settings.JWT_KEY_RELOAD_SECONDS * random.uniform(0.8, 1.2))
+        try:
+            await _rotate_keys()
+            await _load_keys()
+        except Exception as e:
+            print(f"Signing key rotation error: {e!r}")
+
+
+async def init_signing_keys() -> None:
+    """
+    Ensure a signing key exists and load all keys.
+    
+    Called during application startup via lifespan context manager.
+    Does nothing for HMAC algorithms.
+    """
+    if not is_asymmetric():
+        return
+
+    await _rotate_keys()
+    await _load_keys()
+
+    # Another worker may be creating the first key concurrently; wait for it
+    for _ in range(10):
+        if _signing_kid is not None:
+            return
+        await asyncio.sleep(1)
+        await _load_keys()
+    raise RuntimeError("No active JWT signing key available")
+
+
+def start_key_rotation() -> None:
+    """
+    Start the background key rotation task (asymmetric algorithms only).
+    
+    Called during application startup via lifespan context manager.
+    """
+    global _rotation_task
+    if is_asymmetric() and _rotation_task is None:
+        _rotation_task = asyncio.create_task(_rotation_loop())
+
+
+async def stop_key_rotation() -> None:
+    """
+    Stop the background key rotation task.
+    
+    Called during application shutdown via lifespan context manager.
+    """
+    global _rotation_task
+    if _rotation_task is not None:
+        _rotation_task.cancel()
+        try:
+            await _rotation_task
+        except asyncio.CancelledError:
+            pass
+        _rotation_task = None
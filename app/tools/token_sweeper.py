@@ -0,0 +1,191 @@
+"""
+Expired Refresh Token Sweeper.
+
+This module removes expired refresh tokens in the background:
+- Runs every TOKEN_SWEEP_INTERVAL_SECONDS (with jitter, so workers do not
+  wake up at the same moment)
+- Deletes in batches of TOKEN_SWEEP_BATCH_SIZE rows, one short transaction
+  per batch, so locks and WAL bursts stay bounded
+- Only one worker sweeps at a time (transaction-level advisory lock)
+
+With REFRESH_TOKENS_PARTITIONED, a sweep instead creates upcoming daily
+partitions and drops partitions whose day has passed (database/partitions.py).
+Tokens that expired earlier today stay until their partition is dropped;
+they are rejected on use anyway.
+
+Expired access token revocation entries are deleted by the revocation
+listener (tools/revocation.py), user_counts rows are merged by
+tools/user_counts.py.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime
+import datetime as D
+
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from database.database import AsyncSessionLocal
+from database.models_db import RefreshToken
+from database.partitions import create_refresh_token_partitions, drop_expired_refresh_token_partitions
+
+# Advisory lock key serializing sweeps across workers
+_SWEEP_LOCK_ID = 0x52545357  # "RTSW"
+
+_stats = {
+    "runs": 0,
+    "skipped": 0,
+    "deleted": 0,
+    "partitions_created": 0,
+    "partitions_dropped": 0,
+    "errors": 0,
+    "last_run_seconds": None,
+}
+
+# Background sweeper task
+_sweeper_task: asyncio.Task | None = None
+
+
+async def delete_expired_refresh_tokens_batch(db: AsyncSession, batch_size: int) -> int:
+    """
+    Delete up to batch_size expired refresh tokens.
+    
+    Args:
+        db: Database session (the caller commits)
+        batch_size: Maximum number of rows to delete
+        
+    Returns:
+        int: Number of deleted tokens
+        
+    Notes:
+        - Rows locked by concurrent requests (e.g. a refresh in progress)
+          are skipped and picked up by a later batch
+    """
+    now = datetime.now(D.timezone.utc)
+    expired_ids = (
+        select(RefreshToken.id)
+        .filter(RefreshToken.expires_at < now)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        delete(RefreshToken)
+        .where(RefreshToken.id.in_(expired_ids))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+async def maintain_refresh_token_partitions() -> None:
+    """
+    Create upcoming refresh token partitions and drop expired ones.
+    """
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            locked = await session.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id)"),
+                {"lock_id": _SWEEP_LOCK_ID}
+            )
+            if not locked:
+                _stats["skipped"] += 1
+                return
+            conn = await session.connection()
+            _stats["partitions_created"] += await create_refresh_token_partitions(conn)
+            _stats["partitions_dropped"] += await drop_expired_refresh_token_partitions(conn)
+
+    _stats["runs"] += 1
+    _stats["last_run_seconds"] = round(time.perf_counter() - started, 3)
+
+
+async def sweep_expired_refresh_tokens() -> int:
+    """
+    Delete all expired refresh tokens in batches.
+    
+    Returns:
+        int: Number of deleted tokens (0 if another worker is sweeping)
+    """
+    deleted = 0
+    started = time.perf_counter()
+    while True:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                locked = await session.scalar(
+                    text("SELECT pg_try_advisory_xact_lock(:lock_id)"),
+                    {"lock_id": _SWEEP_LOCK_ID}
+                )
+                if not locked:
+                    _stats["skipped"] += 1
+                    return deleted
+                batch = await delete_expired_refresh_tokens_batch(session, settings.TOKEN_SWEEP_BATCH_SIZE)
+
+        deleted += batch
+        if batch == 0 or batch < settings.TOKEN_SWEEP_BATCH_SIZE:
+            break
+        # Let request handlers run between batches
+        await asyncio.sleep(0)
+
+    _stats["runs"] += 1
+    _stats["deleted"] += deleted
+    _stats["last_run_seconds"] = round(time.perf_counter() - started, 3)
+    return deleted
+
+
+async def _sweeper_loop() -> None:
+    """
+    Periodically sweep expired refresh tokens until cancelled.
+    """
+    while True:
+        await asyncio.sleep(settings.TOKEN_SWEEP_INTERVAL_SECONDS * random.uniform(0.8, 1.2))
+        try:
+            if settings.REFRESH_TOKENS_PARTITIONED:
+                await maintain_refresh_token_partitions()
+            else:
+                await sweep_expired_refresh_tokens()
+        except Exception as e:
+            _stats["errors"] += 1
+            print(f"Refresh token sweeper error: {e!r}")
+
+
+def start_token_sweeper() -> None:
+    """
+    Start the background refresh token sweeper.
+    
+    Called during application startup via lifespan context manager.
+    Does nothing if TOKEN_SWEEP_INTERVAL_SECONDS is 0.
+    """
+    global _sweeper_task
+    if settings.TOKEN_SWEEP_INTERVAL_SECONDS > 0 and _sweeper_task is None:
+        _sweeper_task = asyncio.create_task(_sweeper_loop())
+
+
+async def stop_token_sweeper() -> None:
+    """
+    Stop the background refresh token sweeper.
+    
+    Called during application shutdown via lifespan context manager.
+    """
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
+
+
+def get_token_sweeper_stats() -> dict:
+    """
+    Get refresh token sweeper metrics.
+    
+    Returns:
+        dict: Completed runs, runs skipped (another worker held the lock),
+        deleted tokens, partitions created/dropped, errors and duration of
+        the last run
+    """
+    return dict(_stats)
@@ -0,0 +1,132 @@
+"""
+User Count Compaction.
+
+Triggers on users append one user_counts row per write statement and role
+(see database/models_db.py). This module keeps the table small:
+- Runs every USER_COUNTS_COMPACT_SECONDS (with jitter), independently of the
+  refresh token sweeper
+- Merges all rows into one row per role and status in one statement
+- Only one worker compacts at a time (transaction-level advisory lock)
+"""
+
+import asyncio
+import random
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.database import AsyncSessionLocal
+
+# Advisory lock key serializing compaction across workers
+_COMPACT_LOCK_ID = 0x55534354  # "USCT"
+
+_stats = {
+    "runs": 0,
+    "skipped": 0,
+    "rows_merged": 0,
+    "errors": 0,
+    "last_run_seconds": None,
+}
+
+# Background compaction task
+_compaction_task: asyncio.Task | None = None
+
+
+async def compact_user_counts(db: AsyncSession) -> int:
+    """
+    Merge user_counts rows into one row per role and status.
+    
+    Args:
+        db: Database session (the caller commits)
+        
+    Returns:
+        int: Number of rows removed
+        
+    Notes:
+        - Rows inserted by concurrent transactions after the statement
+          started are not deleted and stay as they are
+    """
+    return await db.scalar(text(
+        "WITH merged AS (DELETE FROM user_counts RETURNING is_role, is_active, count), "
+        "inserted AS (INSERT INTO user_counts (is_role, is_active, count) "
+        "SELECT is_role, is_active, sum(count) FROM merged GROUP BY 1, 2 HAVING sum(count) <> 0 RETURNING 1) "
+        "SELECT (SELECT count(*) FROM merged) - (SELECT count(*) FROM inserted)"
+    ))
+
+
+async def run_user_counts_compaction() -> int:
+    """
+    Compact user_counts unless another worker is doing it.
+    
+    Returns:
+        int: Number of rows removed (0 if another worker holds the lock)
+    """
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            locked = await session.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id)"),
+                {"lock_id": _COMPACT_LOCK_ID}
+            )
+            if not locked:
+                _stats["skipped"] += 1
+                return 0
+            merged = await compact_user_counts(session)
+
+    _stats["runs"] += 1
+    _stats["rows_merged"] += merged
+    _stats["last_run_seconds"] = round(time.perf_counter() - started, 3)
+    return merged
+
+
+async def _compaction_loop() -> None:
+    """
+    Periodically compact user_counts until cancelled.
+    """
+    while True:
+        await asyncio.sleep(settings.USER_COUNTS_COMPACT_SECONDS * random.uniform(0.8, 1.2))
+        try:
+            await run_user_counts_compaction()
+        except Exception as e:
+            _stats["errors"] += 1
+            print(f"User count compaction error: {e!r}")
+
+
+def start_user_counts_compaction() -> None:
+    """
+    Start the background user_counts compaction.
+    
+    Called during application startup via lifespan context manager.
+    """
+    global _compaction_task
+    if _compaction_task is None:
+        _compaction_task = asyncio.create_task(_compaction_loop())
+
+
+async def stop_user_counts_compaction() -> None:
+    """
+    Stop the background user_counts compaction.
+    
+    Called during application shutdown via lifespan context manager.
+    """
+    global _compaction_task
+    if _compaction_task is not None:
+        _compaction_task.cancel()
+        try:
+            await _compaction_task
+        except asyncio.CancelledError:
+            pass
+        _compaction_task = None
+
+
+def get_user_counts_stats() -> dict:
+    """
+    Get user_counts compaction metrics.
+    
+    Returns:
+        dict: Completed runs, runs skipped (another worker held the lock),
+        merged rows, errors and duration of the last run
+    """
+    return dict(_stats)